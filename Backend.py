@@ -1,48 +1,50 @@
+import math
+import re
 import sqlite3  
+from bisect import insort
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
 
+from cache import CacheConsultas
+from conexion import obtener_conexion, obtener_sonda, transaccion
+from diagnostico import instrumentar
 
-# Nombre del archivo de nuestra base de datos
-DB_NAME = "usuarios.db"
 
+# Caché de consultas de lectura (catálogo, búsquedas, usuarios, estadísticas).
+# Cada función que escribe invalida las tablas que toca.
+cache = CacheConsultas(sonda=obtener_sonda)
+
+
+@contextmanager
+def _escritura(*tablas):
+    """
+    transaccion(inmediata=True) que además mantiene la caché al día.
+
+    Con el candado de escritura tomado ninguna otra conexión puede confirmar cambios, así
+    que si data_version se movió desde la última lectura fue por una escritura externa
+    anterior: la caché lo revisa antes de que confirmemos la nuestra. Al terminar se
+    invalidan `tablas` (y el data_version nuevo queda como referencia).
+    """
+    with transaccion(inmediata=True) as conn:
+        cache.revisar_cambios_externos()
+        yield conn
+    cache.invalidar(*tablas)
+
+# Las funciones públicas llevan @instrumentar: cuando diagnostico.activar() está en uso
+# se cuentan sus llamadas, tiempos y filas (ver diagnostico.py).
+
+
+@instrumentar
 def inicializar_db():
     """
-    Crea la base de datos y la tabla de usuarios si no existen.
+    Crea la base de datos y las tablas si no existen.
+    El esquema se revisa una sola vez por proceso (ver conexion.py), así que
+    llamarla varias veces no cuesta nada.
     """
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        
-        # tabla usuarios 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                username TEXT PRIMARY KEY,    -- Nombre de usuario (único, no se puede repetir)
-                password TEXT NOT NULL,       -- Contraseña (obligatoria)
-                email TEXT NOT NULL,          -- Correo electrónico (obligatorio)
-                role TEXT NOT NULL            -- Tipo de usuario: "user", "admin", etc. (obligatorio)
-            )
-        ''')
-        # tabla productos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS productos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,   -- ID único para cada producto (se incrementa automáticamente)
-                categoria TEXT,                        -- Categoría del producto (opcional)
-                nombre TEXT NOT NULL,                  -- Nombre del producto (obligatorio)
-                precio REAL NOT NULL                   -- Precio del producto (obligatorio)
-            )
-        ''')
-
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS pedidos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            usuario TEXT NOT NULL,
-            producto_id INTEGER NOT NULL,
-            cantidad INTEGER NOT NULL,
-            fecha TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (producto_id) REFERENCES productos(id)
-        )
-    """)
-        
-        conn.commit()
+    obtener_conexion()
 
+@instrumentar
 def registrar_usuario(usuario, contraseña, correo,tipo_usuario="user"):
     """
     Esta función registra un nuevo usuario en la base de datos.
@@ -51,32 +53,26 @@ def registrar_usuario(usuario, contraseña, correo,tipo_usuario="user"):
     Retorna:
     bool: True si el registro fue exitoso,False si el usuario ya existe.
     """
-    # Primero nos aseguramos de que la base de datos y tabla existan
-    inicializar_db()
-    
-    # Abrimos conexión a la base de datos
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
+    try:
+        # INSERT INTO = insertar datos en la tabla
+        # Los signos ? son "placeholders" para los valores que vamos a insertar
+        # SQLite los reemplaza con los valores que pasamos en la tupla
+        # Evita ataques de "SQL injection"
+        # _escritura toma el candado de escritura (con reintentos si la base está
+        # ocupada), guarda el INSERT al salir del bloque y actualiza la caché
+        with _escritura("usuarios") as conn:
+            conn.execute("INSERT INTO usuarios (username, password, email, role) VALUES (?, ?, ?, ?)",
+                         (usuario, contraseña, correo, tipo_usuario))
         
-        try:
-            # INSERT INTO = insertar datos en la tabla
-            # Los signos ? son "placeholders" para los valores que vamos a insertar
-            # SQLite los reemplaza con los valores que pasamos en la tupla
-            # Evita ataques de "SQL injection"
-            cursor.execute("INSERT INTO usuarios (username, password, email, role) VALUES (?, ?, ?, ?)",
-                           (usuario, contraseña, correo, tipo_usuario))
-            
-            # Guardamos los cambios
-            conn.commit()
-            
-            # Si todo salió bien, devolvemos True
-            return True
-            
-        except sqlite3.IntegrityError:
-            # Esta excepción ocurre cuando intentamos insertar un username que ya existe
-            # (porque username es PRIMARY KEY, debe ser único)
-            return False
+        # Si todo salió bien, devolvemos True
+        return True
+        
+    except sqlite3.IntegrityError:
+        # Esta excepción ocurre cuando intentamos insertar un username que ya existe
+        # (porque username es PRIMARY KEY, debe ser único)
+        return False
 
+@instrumentar
 def validar_usuario_db(usuario, contraseña, correo, tipo_usuario):
     """
     verifica si un usuario existe con todos los datos proporcionados.  
@@ -84,94 +80,631 @@ def validar_usuario_db(usuario, contraseña, correo, tipo_usuario):
     tuple: Una tupla con los datos del usuario si existe
     None: Si no se encuentra ningún usuario con todos los datos especificados
     """
-    # Nos aseguramos de que la base de datos existe
-    inicializar_db()
+    # Usamos la conexión del hilo
+    conn = obtener_conexion()
+    cursor = conn.cursor()
     
-    # Abrimos conexión
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        
-        # SELECT = seleccionar/buscar datos
-        # * significa "todos los campos" (username, password, email, role)
-        # FROM = de qué tabla queremos buscar
-        # WHERE = condiciones para filtrar
-        cursor.execute('''
-            SELECT * FROM usuarios
-            WHERE username = ? AND password = ? AND email = ? AND role = ?
-        ''', (usuario, contraseña, correo, tipo_usuario))
-        
-        # fetchone() devuelve el primer resultado encontrado
-        # Si no encuentra nada, devuelve None
-        # Si encuentra algo, devuelve una tupla con todos los datos del usuario
-        return cursor.fetchone()
+    # SELECT = seleccionar/buscar datos
+    # * significa "todos los campos" (username, password, email, role)
+    # FROM = de qué tabla queremos buscar
+    # WHERE = condiciones para filtrar
+    cursor.execute('''
+        SELECT * FROM usuarios
+        WHERE username = ? AND password = ? AND email = ? AND role = ?
+    ''', (usuario, contraseña, correo, tipo_usuario))
+    
+    # fetchone() devuelve el primer resultado encontrado
+    # Si no encuentra nada, devuelve None
+    # Si encuentra algo, devuelve una tupla con todos los datos del usuario
+    return cursor.fetchone()
     
 
 
+@instrumentar
 def agregar_producto_db(nombre, categoria, precio):
-   with sqlite3.connect(DB_NAME) as conn:
-    conn = conn
-    cur = conn.cursor()
-    cur.execute("INSERT INTO productos (nombre,categoria, precio) VALUES (?, ?, ?)", ( nombre, categoria, precio))
-    conn.commit()
+   with _escritura("productos") as conn:
+      conn.execute("INSERT INTO productos (nombre,categoria, precio) VALUES (?, ?, ?)", ( nombre, categoria, precio))
 
+@instrumentar
 def obtener_productos_db():
-   with sqlite3.connect(DB_NAME) as conn:
-    cur = conn.cursor()
-    cur.execute("SELECT id, nombre, categoria, precio FROM productos")
-    productos = cur.fetchall()
-    return productos
+   """Devuelve todo el catálogo. El resultado queda en caché hasta que cambie la tabla productos."""
+   conn = obtener_conexion()
+
+   def consultar():
+      cur = conn.cursor()
+      cur.execute("SELECT id, nombre, categoria, precio FROM productos")
+      return cur.fetchall()
+
+   # Devolvemos una copia para que quien llama pueda modificar la lista sin tocar la caché
+   return list(cache.obtener(("catalogo",), ("productos",), consultar))
+
+def _consulta_fts(texto):
+   """
+   Convierte lo que escribe el usuario en una consulta FTS5 segura.
+   Cada palabra se busca por prefijo ("cam" encuentra "Camisa") y todas deben aparecer.
+   Las comillas evitan que caracteres como - o * se interpreten como operadores.
+   """
+   palabras = re.findall(r"\w+", texto or "")
+   return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+@instrumentar
+def buscar_productos(texto, categoria=None, limite=50, desplazamiento=0):
+   """
+   Busca productos por nombre o categoría usando el índice de texto completo.
+   Los resultados vienen ordenados por relevancia (coincidencias en el nombre pesan más).
+
+   Parámetros:
+   - texto: palabras a buscar (se aceptan prefijos)
+   - categoria: si se indica, sólo se devuelven productos de esa categoría
+   - limite: cantidad máxima de resultados (None = sin límite)
+   - desplazamiento: cuántos resultados saltar, para paginar
+
+   Retorna:
+   list: tuplas (id, nombre, categoria, precio)
+   """
+   consulta = _consulta_fts(texto)
+   if not consulta:
+      return []
+
+   sql = """
+       SELECT p.id, p.nombre, p.categoria, p.precio
+       FROM productos_fts f
+       JOIN productos p ON p.id = f.rowid
+       WHERE productos_fts MATCH ?
+   """
+   parametros = [consulta]
+   if categoria:
+      sql += " AND p.categoria = ?"
+      parametros.append(categoria)
+   # bm25 con peso 10 para nombre y 1 para categoría; p.id desempata para que la paginación sea estable
+   sql += " ORDER BY bm25(productos_fts, 10.0, 1.0), p.id LIMIT ? OFFSET ?"
+   parametros += [-1 if limite is None else limite, desplazamiento]
+
+   conn = obtener_conexion()
+
+   def consultar():
+      cur = conn.cursor()
+      cur.execute(sql, parametros)
+      return cur.fetchall()
+
+   clave = ("buscar", consulta, categoria, limite, desplazamiento)
+   return list(cache.obtener(clave, ("productos",), consultar))
 
+@instrumentar
 def buscar_producto_db(nombre):
-   with sqlite3.connect(DB_NAME) as conn:
-    cur = conn.cursor()
-    cur.execute("SELECT id, nombre, categoria, precio FROM productos WHERE nombre LIKE ?", (f"%{nombre}%",))
-    resultado = cur.fetchall()
-    return resultado
+   """
+   Busca productos cuyo nombre o categoría contengan palabras que empiecen por `nombre`.
+   Si `nombre` no trae ninguna palabra (vacío o sólo signos) se busca como antes, con LIKE
+   sobre el nombre: un texto vacío devuelve todo el catálogo.
+   """
+   if not _consulta_fts(nombre):
+      cur = obtener_conexion().cursor()
+      cur.execute("SELECT id, nombre, categoria, precio FROM productos WHERE nombre LIKE ?", (f"%{nombre or ''}%",))
+      return cur.fetchall()
+   return buscar_productos(nombre, limite=None)
 
+@instrumentar
 def hacer_pedido_db(usuario, producto_id, cantidad):
    """ Permite a un usuario realizar un pedido y lo registra en la base de datos.
    Solicita el nombre del usuario, el ID del producto y la cantidad."""
 
-   with sqlite3.connect(DB_NAME) as conn:
-    cur = conn.cursor()
-    cur.execute("INSERT INTO pedidos (usuario, producto_id, cantidad) VALUES (?, ?, ?)", (usuario, producto_id, cantidad))
-    conn.commit()
+   # Con _escritura la espera por el candado de escritura (y sus reintentos si la
+   # base sigue ocupada) queda medida igual que en las cargas masivas
+   with _escritura("pedidos") as conn:
+      conn.execute("INSERT INTO pedidos (usuario, producto_id, cantidad) VALUES (?, ?, ?)", (usuario, producto_id, cantidad))
 
+@instrumentar
 def obtener_pedidos_usuario(usuario):
-   with sqlite3.connect(DB_NAME) as conn:
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT p.id, pr.nombre, p.cantidad, p.fecha 
-        FROM pedidos p
-        JOIN productos pr ON p.producto_id = pr.id
-        WHERE p.usuario = ?
-        ORDER BY p.fecha DESC
-    """, (usuario,))
-    pedidos = cur.fetchall()
-    return pedidos
+   conn = obtener_conexion()
+   cur = conn.cursor()
+   cur.execute("""
+       SELECT p.id, pr.nombre, p.cantidad, p.fecha 
+       FROM pedidos p
+       JOIN productos pr ON p.producto_id = pr.id
+       WHERE p.usuario = ?
+       ORDER BY p.fecha DESC, p.id DESC
+   """, (usuario,))
+   pedidos = cur.fetchall()
+   return pedidos
+
+# ==================== PAGINACIÓN ====================
+# Paginación por "keyset": en vez de OFFSET (que recorre todas las filas anteriores),
+# cada página empieza justo después de la última fila de la página anterior.
+# Así pedir la página 1000 cuesta lo mismo que pedir la primera.
+TAMANO_PAGINA = 200
+
+@instrumentar
+def obtener_pagina_productos(despues_de_id=0, tamano_pagina=TAMANO_PAGINA):
+   """
+   Devuelve hasta `tamano_pagina` productos con id mayor que `despues_de_id`, ordenados por id.
+   Para pedir la página siguiente se pasa el id del último producto recibido.
+   """
+   conn = obtener_conexion()
+   cur = conn.cursor()
+   cur.execute("""
+       SELECT id, nombre, categoria, precio
+       FROM productos
+       WHERE id > ?
+       ORDER BY id
+       LIMIT ?
+   """, (despues_de_id, tamano_pagina))
+   return cur.fetchall()
+
+@instrumentar
+def iter_productos(despues_de_id=0, tamano_pagina=TAMANO_PAGINA):
+   """
+   Generador que recorre todo el catálogo de a una página por consulta.
+   Nunca tiene en memoria más de `tamano_pagina` productos.
+   """
+   while True:
+      pagina = obtener_pagina_productos(despues_de_id, tamano_pagina)
+      yield from pagina
+      if len(pagina) < tamano_pagina:
+         return
+      despues_de_id = pagina[-1][0]
+
+@instrumentar
+def obtener_pagina_pedidos_usuario(usuario, antes_de=None, tamano_pagina=TAMANO_PAGINA):
+   """
+   Devuelve hasta `tamano_pagina` pedidos del usuario, del más reciente al más antiguo.
+
+   `antes_de` es la tupla (fecha, id) del último pedido de la página anterior
+   (None para la primera página). Se usa el id para desempatar pedidos con la misma fecha.
+   """
+   sql = """
+       SELECT p.id, pr.nombre, p.cantidad, p.fecha
+       FROM pedidos p
+       JOIN productos pr ON p.producto_id = pr.id
+       WHERE p.usuario = ?
+   """
+   parametros = [usuario]
+   if antes_de is not None:
+      sql += " AND (p.fecha, p.id) < (?, ?)"
+      parametros += list(antes_de)
+   sql += " ORDER BY p.fecha DESC, p.id DESC LIMIT ?"
+   parametros.append(tamano_pagina)
+
+   conn = obtener_conexion()
+   cur = conn.cursor()
+   cur.execute(sql, parametros)
+   return cur.fetchall()
+
+@instrumentar
+def iter_pedidos_usuario(usuario, antes_de=None, tamano_pagina=TAMANO_PAGINA):
+   """
+   Generador con todos los pedidos del usuario (más recientes primero), de a una página por consulta.
+   """
+   while True:
+      pagina = obtener_pagina_pedidos_usuario(usuario, antes_de, tamano_pagina)
+      yield from pagina
+      if len(pagina) < tamano_pagina:
+         return
+      ultimo = pagina[-1]
+      antes_de = (ultimo[3], ultimo[0])
+
+@instrumentar
+def contar_productos():
+   """Cantidad de productos en el catálogo."""
+   conn = obtener_conexion()
+   cur = conn.cursor()
+   cur.execute("SELECT COUNT(*) FROM productos")
+   return cur.fetchone()[0]
+
+@instrumentar
+def contar_pedidos_usuario(usuario):
+   """Cantidad de pedidos de un usuario (se resuelve sólo con el índice, sin leer la tabla)."""
+   conn = obtener_conexion()
+   cur = conn.cursor()
+   cur.execute("SELECT COUNT(*) FROM pedidos WHERE usuario = ?", (usuario,))
+   return cur.fetchone()[0]
    
+@instrumentar
 def obtener_usuarios():
     """Obtiene todos los usernames de usuarios registrados"""
-    with sqlite3.connect(DB_NAME) as conn:
+    conn = obtener_conexion()
+
+    def consultar():
         cur = conn.cursor()
         cur.execute("SELECT username FROM usuarios")
         usuarios = cur.fetchall()
         return [usuario[0] for usuario in usuarios]
 
+    return list(cache.obtener(("usuarios",), ("usuarios",), consultar))
+
+# Estadísticas por producto leídas del resumen ventas_producto
+_SQL_ESTADISTICAS_VENTAS = """
+    SELECT 
+        pr.nombre as producto,
+        v.unidades as total_vendido,
+        pr.precio as precio_unitario,
+        v.unidades * pr.precio as total_ingresos
+    FROM ventas_producto v
+    JOIN productos pr ON v.producto_id = pr.id
+    WHERE v.unidades > 0
+    ORDER BY total_vendido DESC
+"""
+
+@instrumentar
 def obtener_estadisticas_ventas():
-    """Obtiene estadísticas de ventas por producto"""
-    with sqlite3.connect(DB_NAME) as conn:
+    """
+    Obtiene estadísticas de ventas por producto.
+    Lee el resumen ventas_producto (actualizado por triggers con cada pedido), así que
+    el costo depende de la cantidad de productos y no del historial de pedidos.
+    """
+    conn = obtener_conexion()
+
+    def consultar():
         cur = conn.cursor()
+        cur.execute(_SQL_ESTADISTICAS_VENTAS)
+        return cur.fetchall()
+
+    # Depende de pedidos (unidades) y de productos (nombre y precio)
+    return list(cache.obtener(("estadisticas_ventas",), ("pedidos", "productos"), consultar))
+
+@instrumentar
+def iter_estadisticas_ventas(tamano_lote=TAMANO_PAGINA):
+    """
+    Generador con las mismas filas que obtener_estadisticas_ventas, leídas del cursor
+    de a `tamano_lote` por vez (para exportar sin cargar todo en memoria).
+    """
+    # Usamos un cursor propio: así la consulta sigue abierta aunque el hilo haga otras consultas
+    cur = obtener_conexion().cursor()
+    try:
+        cur.execute(_SQL_ESTADISTICAS_VENTAS)
+        while True:
+            lote = cur.fetchmany(tamano_lote)
+            if not lote:
+                return
+            yield from lote
+    finally:
+        cur.close()
+
+@instrumentar
+def contar_estadisticas_ventas():
+    """Cantidad de filas que tiene el reporte de ventas (productos con ventas)."""
+    conn = obtener_conexion()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COUNT(*) FROM ventas_producto v
+        JOIN productos pr ON v.producto_id = pr.id
+        WHERE v.unidades > 0
+    """)
+    return cur.fetchone()[0]
+
+@instrumentar
+def obtener_estadisticas_ventas_rango(desde=None, hasta=None):
+    """
+    Igual que obtener_estadisticas_ventas, pero sólo para los días entre `desde` y `hasta`
+    (fechas 'YYYY-MM-DD', ambas incluidas; None deja ese extremo abierto).
+    Se calcula con el resumen diario, sin leer la tabla pedidos.
+    """
+    conn = obtener_conexion()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT 
+            pr.nombre as producto,
+            SUM(v.unidades) as total_vendido,
+            pr.precio as precio_unitario,
+            SUM(v.unidades) * pr.precio as total_ingresos
+        FROM ventas_producto_dia v
+        JOIN productos pr ON v.producto_id = pr.id
+        WHERE v.dia >= IFNULL(?, '') AND v.dia <= IFNULL(?, '9999-12-31')
+        GROUP BY v.producto_id
+        HAVING total_vendido > 0
+        ORDER BY total_vendido DESC
+    """, (desde, hasta))
+    return cur.fetchall()
+
+@instrumentar
+def obtener_totales_ventas(desde=None, hasta=None):
+    """
+    Total de unidades vendidas e ingresos entre dos fechas ('YYYY-MM-DD', incluidas).
+    Sin fechas, usa el resumen general por producto.
+
+    Retorna:
+    tuple: (unidades, ingresos)
+    """
+    conn = obtener_conexion()
+    cur = conn.cursor()
+    if desde is None and hasta is None:
         cur.execute("""
-            SELECT 
-                pr.nombre as producto,
-                SUM(p.cantidad) as total_vendido,
-                pr.precio as precio_unitario,
-                SUM(p.cantidad * pr.precio) as total_ingresos
-            FROM pedidos p
-            JOIN productos pr ON p.producto_id = pr.id
-            GROUP BY p.producto_id, pr.nombre, pr.precio
-            ORDER BY total_vendido DESC
+            SELECT IFNULL(SUM(v.unidades), 0), IFNULL(SUM(v.unidades * pr.precio), 0)
+            FROM ventas_producto v
+            JOIN productos pr ON v.producto_id = pr.id
+        """)
+    else:
+        cur.execute("""
+            SELECT IFNULL(SUM(v.unidades), 0), IFNULL(SUM(v.unidades * pr.precio), 0)
+            FROM ventas_producto_dia v
+            JOIN productos pr ON v.producto_id = pr.id
+            WHERE v.dia >= IFNULL(?, '') AND v.dia <= IFNULL(?, '9999-12-31')
+        """, (desde, hasta))
+    return cur.fetchone()
+
+# Unidades vendidas calculadas desde cero con la tabla pedidos (lo que deberían decir los resúmenes)
+_VENTAS_REALES = """
+    real_producto AS (
+        SELECT producto_id, SUM(cantidad) AS unidades FROM pedidos GROUP BY producto_id
+    ),
+    real_dia AS (
+        SELECT producto_id, date(fecha) AS dia, SUM(cantidad) AS unidades FROM pedidos
+        WHERE date(fecha) IS NOT NULL
+        GROUP BY producto_id, date(fecha)
+    )
+"""
+
+@instrumentar
+def verificar_resumen_ventas():
+    """
+    Compara los resúmenes de ventas con lo que da recorrer toda la tabla pedidos.
+    Es una consulta cara (lee todo el historial): está pensada para mantenimiento.
+
+    Retorna:
+    list: diferencias encontradas como (producto_id, dia, unidades_reales, unidades_resumen);
+          dia es None para el resumen general. Lista vacía si todo cuadra.
+    """
+    conn = obtener_conexion()
+    cur = conn.cursor()
+    cur.execute(f"""
+        WITH {_VENTAS_REALES},
+        claves_producto AS (
+            SELECT producto_id FROM real_producto
+            UNION SELECT producto_id FROM ventas_producto
+        ),
+        claves_dia AS (
+            SELECT producto_id, dia FROM real_dia
+            UNION SELECT producto_id, dia FROM ventas_producto_dia
+        )
+        SELECT c.producto_id, NULL, IFNULL(r.unidades, 0), IFNULL(v.unidades, 0)
+        FROM claves_producto c
+        LEFT JOIN real_producto r ON r.producto_id = c.producto_id
+        LEFT JOIN ventas_producto v ON v.producto_id = c.producto_id
+        WHERE IFNULL(r.unidades, 0) != IFNULL(v.unidades, 0)
+        UNION ALL
+        SELECT c.producto_id, c.dia, IFNULL(r.unidades, 0), IFNULL(v.unidades, 0)
+        FROM claves_dia c
+        LEFT JOIN real_dia r ON r.producto_id = c.producto_id AND r.dia = c.dia
+        LEFT JOIN ventas_producto_dia v ON v.producto_id = c.producto_id AND v.dia = c.dia
+        WHERE IFNULL(r.unidades, 0) != IFNULL(v.unidades, 0)
+    """)
+    return cur.fetchall()
+
+@instrumentar
+def reconstruir_resumen_ventas():
+    """
+    Vuelve a calcular los resúmenes de ventas desde la tabla pedidos.
+    Se hace en una sola transacción: quien lea mientras tanto ve los datos viejos, nunca a medias.
+    """
+    with _escritura("pedidos") as conn:
+        conn.execute("DELETE FROM ventas_producto")
+        conn.execute("DELETE FROM ventas_producto_dia")
+        conn.execute(f"""
+            INSERT INTO ventas_producto(producto_id, unidades)
+            WITH {_VENTAS_REALES}
+            SELECT producto_id, unidades FROM real_producto
+        """)
+        conn.execute(f"""
+            INSERT INTO ventas_producto_dia(producto_id, dia, unidades)
+            WITH {_VENTAS_REALES}
+            SELECT producto_id, dia, unidades FROM real_dia
         """)
-        estadisticas = cur.fetchall()
-        return estadisticas
+
+# ==================== CARGA MASIVA ====================
+TAMANO_LOTE = 1000   # Filas que se insertan por transacción en la carga masiva
+MAX_ERRORES = 100    # Mensajes de error que se guardan (los de las primeras filas); el resto sólo se cuenta
+MAX_VARIABLES = 999  # Parámetros por sentencia que acepta SQLite en versiones anteriores a 3.32
+
+def _columnas(fila, cantidades, descripcion):
+    """Convierte la fila en tupla y revisa que tenga una de las `cantidades` de columnas esperadas."""
+    if isinstance(fila, (str, bytes)):
+        fila = (fila,)
+    try:
+        fila = tuple(fila)
+    except TypeError:
+        raise ValueError(f"La fila no tiene el formato esperado ({descripcion}).")
+    if len(fila) not in cantidades:
+        columnas = "1 columna" if len(fila) == 1 else f"{len(fila)} columnas"
+        raise ValueError(f"La fila tiene {columnas}; se esperaban {descripcion}.")
+    return fila
+
+def _entero(valor):
+    """Convierte a int sin redondear: 2, 2.0 y "2" sirven; 2.5 o "dos" lanzan ValueError."""
+    if isinstance(valor, str):
+        valor = valor.strip()
+        try:
+            return int(valor)
+        except ValueError:
+            valor = float(valor)
+    if isinstance(valor, float):
+        # Excel guarda los números como float: aceptamos 2.0 pero no 2.5 (ni nan/inf)
+        if not valor.is_integer():
+            raise ValueError(valor)
+        return int(valor)
+    return int(valor)
+
+def _validar_producto(fila):
+    """Normaliza una fila de producto a (nombre, categoria, precio) o lanza ValueError."""
+    if isinstance(fila, dict):
+        fila = (fila.get("nombre"), fila.get("categoria"), fila.get("precio"))
+    nombre, categoria, precio = _columnas(fila, (3,), "3 (nombre, categoría, precio)")
+    nombre = str(nombre).strip() if nombre is not None else ""
+    if not nombre:
+        raise ValueError("El nombre no puede estar vacío.")
+    try:
+        precio = float(precio)
+    except (TypeError, ValueError):
+        raise ValueError(f"El precio debe ser un número (recibido: {precio!r}).")
+    if not math.isfinite(precio):
+        raise ValueError(f"El precio debe ser un número finito (recibido: {precio!r}).")
+    if precio < 0:
+        raise ValueError("El precio no puede ser negativo.")
+    categoria = str(categoria).strip() if categoria not in (None, "") else None
+    return nombre, categoria, precio
+
+def _validar_pedido(fila):
+    """Normaliza una fila de pedido a (usuario, producto_id, cantidad, fecha) o lanza ValueError."""
+    if isinstance(fila, dict):
+        fila = (fila.get("usuario"), fila.get("producto_id"), fila.get("cantidad"), fila.get("fecha"))
+    fila = _columnas(fila, (3, 4), "3 o 4 (usuario, producto, cantidad y fecha opcional)")
+    if len(fila) == 3:
+        fila = (*fila, None)
+    usuario, producto_id, cantidad, fecha = fila
+    usuario = str(usuario).strip() if usuario is not None else ""
+    if not usuario:
+        raise ValueError("El usuario no puede estar vacío.")
+    try:
+        producto_id = _entero(producto_id)
+        cantidad = _entero(cantidad)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("El ID del producto y la cantidad deben ser números enteros.")
+    if cantidad <= 0:
+        raise ValueError("La cantidad debe ser mayor que cero.")
+    if fecha not in (None, ""):
+        # Guardamos la fecha en el mismo formato que CURRENT_TIMESTAMP para que ordene bien
+        try:
+            fecha = datetime.fromisoformat(str(fecha)).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            raise ValueError(f"La fecha no es válida (recibida: {fecha!r}); use YYYY-MM-DD HH:MM:SS.")
+    else:
+        fecha = None
+    return usuario, producto_id, cantidad, fecha
+
+def _productos_existentes(conn, ids):
+    """Devuelve el subconjunto de `ids` que existen en la tabla productos."""
+    ids = list(set(ids))
+    existentes = set()
+    # Por partes, para no pasarnos del límite de parámetros de SQLite
+    for inicio in range(0, len(ids), MAX_VARIABLES):
+        parte = ids[inicio:inicio + MAX_VARIABLES]
+        marcas = ",".join("?" * len(parte))
+        cur = conn.execute(f"SELECT id FROM productos WHERE id IN ({marcas})", parte)
+        existentes.update(fila[0] for fila in cur)
+    return existentes
+
+def _insertar_por_lotes(sql, tabla, filas, validar, tamano_lote, primera_fila, progreso, verificar=None):
+    """
+    Inserta `filas` en lotes de `tamano_lote`, cada lote en una sola transacción con executemany.
+    Las filas inválidas se cuentan y se reportan en la lista de errores (sólo las MAX_ERRORES
+    primeras, para que un archivo con muchos errores no llene la memoria); no detienen la carga.
+    Cada lote guardado invalida `tabla` en la caché.
+
+    `verificar(conn, validas)` puede devolver errores extra por fila (consultando la base)
+    como una lista de (indice_en_validas, mensaje).
+    """
+    insertados = 0
+    errores = []   # (número de fila, mensaje) de las MAX_ERRORES primeras filas con error, en orden
+    total_errores = 0
+    numero = primera_fila
+    iterador = iter(filas)
+
+    def anotar_error(fila, mensaje):
+        nonlocal total_errores
+        total_errores += 1
+        if len(errores) < MAX_ERRORES or fila < errores[-1][0]:
+            insort(errores, (fila, mensaje))
+            del errores[MAX_ERRORES:]
+
+    while True:
+        lote = list(islice(iterador, tamano_lote))
+        if not lote:
+            break
+
+        # 1) Validamos en Python, sin tocar la base
+        validas = []   # (número de fila, valores)
+        for fila in lote:
+            if fila is None:
+                numero += 1   # Fila vacía: no es un error, sólo la saltamos
+                continue
+            try:
+                validas.append((numero, validar(fila)))
+            except (ValueError, TypeError) as e:
+                anotar_error(numero, str(e))
+            numero += 1
+
+        # 2) Insertamos todo el lote en una transacción
+        with _escritura(tabla) as conn:
+            if verificar is not None and validas:
+                rechazadas = dict(verificar(conn, [valores for _, valores in validas]))
+                for i in sorted(rechazadas):
+                    anotar_error(validas[i][0], rechazadas[i])
+                validas = [v for i, v in enumerate(validas) if i not in rechazadas]
+
+            try:
+                conn.execute("SAVEPOINT lote")
+                conn.executemany(sql, [valores for _, valores in validas])
+                conn.execute("RELEASE lote")
+                insertados += len(validas)
+            except sqlite3.IntegrityError:
+                # Alguna fila violó una restricción: repetimos fila por fila para saber cuál
+                conn.execute("ROLLBACK TO lote")
+                conn.execute("RELEASE lote")
+                for num, valores in validas:
+                    try:
+                        conn.execute(sql, valores)
+                        insertados += 1
+                    except sqlite3.IntegrityError as e:
+                        anotar_error(num, str(e))
+
+        if progreso:
+            progreso(numero - primera_fila, insertados, total_errores)
+
+    return {"insertados": insertados, "errores": errores, "total_errores": total_errores}
+
+@instrumentar
+def agregar_productos_bulk(filas, tamano_lote=TAMANO_LOTE, primera_fila=1, progreso=None):
+    """
+    Agrega muchos productos de una vez.
+
+    Parámetros:
+    - filas: cualquier iterable o generador de (nombre, categoria, precio) o de diccionarios
+      con esas claves. Se consume de a un lote, nunca se carga todo en memoria.
+      Las filas None se saltan sin reportar error.
+    - tamano_lote: filas por transacción
+    - primera_fila: número con el que se identifica la primera fila en los errores
+    - progreso: función opcional progreso(procesadas, insertadas, errores) llamada tras cada lote
+
+    Retorna:
+    dict: {"insertados": int, "errores": [(número de fila, mensaje), ...], "total_errores": int}
+    (errores trae sólo las MAX_ERRORES primeras filas con error; total_errores las cuenta todas)
+    """
+    return _insertar_por_lotes(
+        "INSERT INTO productos (nombre, categoria, precio) VALUES (?, ?, ?)", "productos",
+        filas, _validar_producto, tamano_lote, primera_fila, progreso)
+
+def _verificar_pedidos(conn, validas):
+    """Marca como error los pedidos cuyo producto no existe."""
+    existentes = _productos_existentes(conn, [v[1] for v in validas])
+    return [(i, f"El producto {v[1]} no existe.")
+            for i, v in enumerate(validas) if v[1] not in existentes]
+
+@instrumentar
+def hacer_pedidos_bulk(filas, tamano_lote=TAMANO_LOTE, primera_fila=1, progreso=None):
+    """
+    Registra muchos pedidos de una vez (por ejemplo, para reprocesar los pedidos de un día).
+
+    Parámetros:
+    - filas: iterable de (usuario, producto_id, cantidad) o (usuario, producto_id, cantidad, fecha),
+      o diccionarios con esas claves. Si no hay fecha se usa la actual.
+    - tamano_lote, primera_fila, progreso: igual que en agregar_productos_bulk
+
+    Retorna:
+    dict: {"insertados": int, "errores": [(número de fila, mensaje), ...], "total_errores": int}
+    (errores trae sólo las MAX_ERRORES primeras filas con error; total_errores las cuenta todas)
+    """
+    return _insertar_por_lotes(
+        "INSERT INTO pedidos (usuario, producto_id, cantidad, fecha) "
+        "VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))", "pedidos",
+        filas, _validar_pedido, tamano_lote, primera_fila, progreso,
+        verificar=_verificar_pedidos)
+
+# ==================== CACHÉ ====================
+def estadisticas_cache():
+    """
+    Contadores de la caché de consultas: aciertos, fallos, descartes por espacio,
+    invalidaciones por escrituras, entradas actuales y tasa de aciertos.
+    """
+    return cache.estadisticas()
+
+def limpiar_cache():
+    """Vacía la caché de consultas (la próxima lectura va a la base de datos)."""
+    cache.invalidar()
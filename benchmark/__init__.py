@@ -0,0 +1,18 @@
+"""
+Pruebas de rendimiento del Backend con datos sintéticos.
+
+Crea una base de datos nueva con usuarios, productos y pedidos inventados, mide cuánto
+tardan las funciones públicas de Backend.py con distintos tamaños de datos y cantidad de
+hilos, y guarda los resultados (p50/p95/p99 y operaciones por segundo) en JSON.
+Si se le pasa un resultado anterior como base, avisa qué operaciones se volvieron más lentas.
+
+No abre ventanas ni importa tkinter, así que se puede correr en un servidor sin pantalla.
+
+Uso:
+    python -m benchmark --escalas 1,10 --hilos 1,4 --salida resultados.json
+    python -m benchmark --base resultados_anteriores.json --tolerancia 0.25
+
+Las funciones están en los submódulos benchmark.datos (generar_datos) y benchmark.medir
+(OPERACIONES, medir, comparar_con_base); no se reexportan aquí porque `medir` taparía
+al submódulo del mismo nombre.
+"""
@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+import conexion
+from benchmark.datos import generar_datos
+from benchmark.medir import OPERACIONES, medir, datos_para_medir, comparar_con_base
+
+
+def _lista_enteros(texto):
+    return [int(x) for x in texto.split(",") if x.strip()]
+
+
+def _lista_operaciones(texto):
+    nombres = [x.strip() for x in texto.split(",") if x.strip()]
+    desconocidas = [n for n in nombres if n not in OPERACIONES]
+    if desconocidas:
+        raise argparse.ArgumentTypeError("operaciones desconocidas: " + ", ".join(desconocidas))
+    return nombres
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark",
+                                     description="Mide el rendimiento de Backend.py con datos sintéticos.")
+    parser.add_argument("--usuarios", type=int, default=200, help="usuarios en la escala 1")
+    parser.add_argument("--productos", type=int, default=2000, help="productos en la escala 1")
+    parser.add_argument("--pedidos", type=int, default=20000, help="pedidos en la escala 1")
+    parser.add_argument("--escalas", type=_lista_enteros, default=[1, 10],
+                        help="multiplicadores de las cantidades, separados por coma (por defecto 1,10)")
+    parser.add_argument("--hilos", type=_lista_enteros, default=[1, 4],
+                        help="niveles de concurrencia, separados por coma (por defecto 1,4)")
+    parser.add_argument("--llamadas", type=int, default=200, help="llamadas por operación y nivel de hilos")
+    parser.add_argument("--operaciones", type=_lista_operaciones, default=list(OPERACIONES),
+                        help="operaciones a medir, separadas por coma (por defecto todas)")
+    parser.add_argument("--sin-cache", action="store_true", help="vacía la caché del Backend antes de cada llamada")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--db", help="archivo donde generar los datos (por defecto uno temporal)")
+    parser.add_argument("--sobrescribir", action="store_true", help="permite borrar el archivo de --db si ya existe")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados (por defecto, pantalla)")
+    parser.add_argument("--base", help="resultados anteriores (JSON) contra los que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo del p95 que se considera regresión (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    carpeta = None
+    if args.db:
+        # Los datos se generan desde cero: no borramos una base existente sin permiso
+        if os.path.exists(args.db) and not args.sobrescribir:
+            parser.error(f"{args.db} ya existe; use --sobrescribir para reemplazarlo")
+        ruta = args.db
+    else:
+        carpeta = tempfile.TemporaryDirectory(prefix="benchmark_")
+        ruta = os.path.join(carpeta.name, "benchmark.db")
+
+    resultados = []
+    for escala in args.escalas:
+        cantidades = generar_datos(ruta, args.usuarios * escala, args.productos * escala,
+                                   args.pedidos * escala, semilla=args.semilla)
+        print(f"Escala {escala}: {cantidades}", file=sys.stderr)
+        datos = datos_para_medir(cantidades)
+        for hilos in args.hilos:
+            for nombre in args.operaciones:
+                resultado = medir(nombre, datos, args.llamadas, hilos=hilos,
+                                  semilla=args.semilla, sin_cache=args.sin_cache)
+                resultado = dict(escala=escala, **cantidades, **resultado)
+                resultados.append(resultado)
+                print(f"  {hilos} hilo(s) {nombre:<34} p50={resultado['p50_ms']:.3f}ms "
+                      f"p95={resultado['p95_ms']:.3f}ms p99={resultado['p99_ms']:.3f}ms "
+                      f"{resultado['ops_por_segundo']:.0f} op/s", file=sys.stderr)
+
+    informe = {
+        "entorno": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+        },
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("salida", "base", "db", "sobrescribir")},
+        "resultados": resultados,
+    }
+
+    codigo = 0
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar_con_base(resultados, base, tolerancia=args.tolerancia)
+        informe["regresiones"] = regresiones
+        for r in regresiones:
+            print(f"REGRESIÓN escala={r['escala']} hilos={r['hilos']} {r['operacion']}: "
+                  f"p95 {r['p95_base_ms']:.3f}ms -> {r['p95_ms']:.3f}ms", file=sys.stderr)
+        if regresiones:
+            codigo = 1
+        else:
+            print("Sin regresiones respecto a la base.", file=sys.stderr)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if carpeta is not None:
+        conexion.cerrar_conexiones()
+        carpeta.cleanup()
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
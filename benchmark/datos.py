@@ -0,0 +1,114 @@
+import os
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import conexion
+from Backend import agregar_productos_bulk, hacer_pedidos_bulk
+
+
+# Mismas categorías que usa "Ingresar Inventario", con un peso aproximado de cuánto aparecen
+CATEGORIAS = {
+    'Ropa': 35, 'Zapatos': 20, 'Cremas': 12, 'Lociones': 10, 'Accesorios': 15, 'Otros': 8,
+}
+
+# Palabras para armar nombres de productos parecidos a los reales
+SUSTANTIVOS = {
+    'Ropa': ['Camisa', 'Camiseta', 'Pantalón', 'Blusa', 'Vestido', 'Falda', 'Chaqueta', 'Suéter'],
+    'Zapatos': ['Tenis', 'Sandalias', 'Botas', 'Mocasines', 'Zapatillas', 'Tacones'],
+    'Cremas': ['Crema hidratante', 'Crema facial', 'Crema corporal', 'Protector solar', 'Bálsamo'],
+    'Lociones': ['Loción', 'Perfume', 'Colonia', 'Splash', 'Agua de tocador'],
+    'Accesorios': ['Collar', 'Pulsera', 'Aretes', 'Bolso', 'Cinturón', 'Gorra', 'Reloj'],
+    'Otros': ['Llavero', 'Estuche', 'Toalla', 'Cojín', 'Taza', 'Vela aromática'],
+}
+ADJETIVOS = ['clásico', 'deportivo', 'elegante', 'casual', 'premium', 'básico', 'juvenil', 'edición especial']
+COLORES = ['negro', 'blanco', 'azul', 'rojo', 'verde', 'rosado', 'gris', 'beige', 'dorado']
+
+# Precio típico por categoría (los precios reales se reparten alrededor de este valor)
+PRECIO_BASE = {
+    'Ropa': 60000, 'Zapatos': 150000, 'Cremas': 35000, 'Lociones': 90000, 'Accesorios': 40000, 'Otros': 20000,
+}
+
+DIAS_HISTORIAL = 365   # Los pedidos se reparten en el último año
+
+
+def terminos_busqueda():
+    """Palabras (y prefijos) que se usan como búsquedas típicas en las mediciones."""
+    palabras = [s.split()[0] for lista in SUSTANTIVOS.values() for s in lista] + COLORES
+    return palabras + [p[:3] for p in palabras]
+
+
+def borrar_base(ruta):
+    """Borra el archivo de la base y sus archivos WAL/SHM, si existen."""
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(ruta + sufijo):
+            os.remove(ruta + sufijo)
+
+
+def _pesos_zipf(n, s=1.1):
+    """Pesos acumulados tipo Zipf: pocos elementos muy populares y muchos poco usados."""
+    return list(accumulate(1 / (rango + 1) ** s for rango in range(n)))
+
+
+def _productos(rng, cantidad):
+    categorias = list(CATEGORIAS)
+    pesos = list(CATEGORIAS.values())
+    for _ in range(cantidad):
+        categoria = rng.choices(categorias, pesos)[0]
+        nombre = f"{rng.choice(SUSTANTIVOS[categoria])} {rng.choice(ADJETIVOS)} {rng.choice(COLORES)}"
+        # Distribución log-normal: la mayoría cerca del precio base, algunos mucho más caros
+        precio = round(PRECIO_BASE[categoria] * rng.lognormvariate(0, 0.4), -2)
+        yield nombre, categoria, precio
+
+
+def _pedidos(rng, cantidad, usuarios, productos):
+    """Pedidos con clientes y productos de popularidad desigual, repartidos en el último año."""
+    pesos_usuarios = _pesos_zipf(usuarios, 0.8)
+    pesos_productos = _pesos_zipf(productos)
+    ids_usuarios = list(range(usuarios))
+    ids_productos = list(range(1, productos + 1))
+    # Barajamos para que los más populares no sean siempre los primeros ids
+    rng.shuffle(ids_usuarios)
+    rng.shuffle(ids_productos)
+    ahora = datetime.now()
+    for _ in range(cantidad):
+        usuario = ids_usuarios[rng.choices(range(usuarios), cum_weights=pesos_usuarios)[0]]
+        producto = ids_productos[rng.choices(range(productos), cum_weights=pesos_productos)[0]]
+        cantidad_pedida = rng.choices([1, 2, 3, 4, 5], [60, 20, 10, 6, 4])[0]
+        fecha = ahora - timedelta(seconds=rng.randrange(DIAS_HISTORIAL * 86400))
+        yield nombre_usuario(usuario), producto, cantidad_pedida, fecha.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def nombre_usuario(i):
+    return f"usuario{i}"
+
+
+def datos_usuario(i):
+    """(username, password, email, role) del usuario sintético número i."""
+    return nombre_usuario(i), f"clave{i}", f"{nombre_usuario(i)}@gmail.com", "admin" if i % 50 == 0 else "user"
+
+
+def generar_datos(ruta, usuarios, productos, pedidos, semilla=42):
+    """
+    Crea desde cero la base `ruta` con datos sintéticos y la deja configurada como base activa.
+
+    Retorna:
+    dict: cantidades generadas
+    """
+    rng = random.Random(semilla)
+    # Primero cerramos las conexiones (por ejemplo, las de la escala anterior):
+    # en Windows no se puede borrar un archivo que sigue abierto
+    conexion.cerrar_conexiones()
+    borrar_base(ruta)
+    conexion.configurar_db(ruta)
+
+    with conexion.transaccion(inmediata=True) as conn:
+        conn.executemany("INSERT INTO usuarios (username, password, email, role) VALUES (?, ?, ?, ?)",
+                         (datos_usuario(i) for i in range(usuarios)))
+    agregar_productos_bulk(_productos(rng, productos))
+    if usuarios and productos:
+        hacer_pedidos_bulk(_pedidos(rng, pedidos, usuarios, productos))
+
+    # Actualizamos las estadísticas del planificador como lo haría una base en uso
+    conexion.obtener_conexion().execute("ANALYZE")
+    return {"usuarios": usuarios, "productos": productos, "pedidos": pedidos}
@@ -0,0 +1,155 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Backend
+from benchmark.datos import datos_usuario, terminos_busqueda
+
+
+def _validar_usuario(rng, datos):
+    return Backend.validar_usuario_db(*datos_usuario(rng.randrange(datos["usuarios"])))
+
+
+def _registrar_usuario(rng, datos):
+    # Usuarios nuevos con un nombre que no choca con los generados ni entre hilos
+    nuevo = f"nuevo{threading.get_ident()}_{time.perf_counter_ns()}"
+    return Backend.registrar_usuario(nuevo, "clave", f"{nuevo}@gmail.com")
+
+
+def _buscar(rng, datos):
+    return Backend.buscar_producto_db(rng.choice(datos["terminos"]))
+
+
+def _buscar_paginado(rng, datos):
+    return Backend.buscar_productos(rng.choice(datos["terminos"]), limite=50)
+
+
+def _pedidos_usuario(rng, datos):
+    return Backend.obtener_pedidos_usuario(datos_usuario(rng.randrange(datos["usuarios"]))[0])
+
+
+def _pagina_pedidos(rng, datos):
+    return Backend.obtener_pagina_pedidos_usuario(datos_usuario(rng.randrange(datos["usuarios"]))[0])
+
+
+def _hacer_pedido(rng, datos):
+    usuario = datos_usuario(rng.randrange(datos["usuarios"]))[0]
+    return Backend.hacer_pedido_db(usuario, rng.randrange(1, datos["productos"] + 1), 1)
+
+
+def _agregar_producto(rng, datos):
+    return Backend.agregar_producto_db("Producto de prueba", "Otros", 1000)
+
+
+def _ventas_rango(rng, datos):
+    return Backend.obtener_estadisticas_ventas_rango("2000-01-01", "2100-01-01")
+
+
+# Operaciones que se miden: nombre -> función(rng, datos).
+# Las que escriben también se miden, así que la base crece un poco durante la prueba.
+OPERACIONES = {
+    "validar_usuario_db": _validar_usuario,
+    "registrar_usuario": _registrar_usuario,
+    "buscar_producto_db": _buscar,
+    "buscar_productos": _buscar_paginado,
+    "obtener_productos_db": lambda rng, datos: Backend.obtener_productos_db(),
+    "obtener_pagina_productos": lambda rng, datos: Backend.obtener_pagina_productos(),
+    "obtener_usuarios": lambda rng, datos: Backend.obtener_usuarios(),
+    "obtener_pedidos_usuario": _pedidos_usuario,
+    "obtener_pagina_pedidos_usuario": _pagina_pedidos,
+    "obtener_estadisticas_ventas": lambda rng, datos: Backend.obtener_estadisticas_ventas(),
+    "obtener_estadisticas_ventas_rango": _ventas_rango,
+    "hacer_pedido_db": _hacer_pedido,
+    "agregar_producto_db": _agregar_producto,
+}
+
+
+def percentil(valores_ordenados, p):
+    """Percentil p (0-100) por rango más cercano de una lista ya ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def medir(nombre, datos, llamadas, hilos=1, semilla=0, sin_cache=False):
+    """
+    Llama `llamadas` veces a la operación `nombre` repartidas en `hilos` hilos.
+
+    Parámetros:
+    - datos: dict con "usuarios", "productos" y "terminos" (para elegir argumentos al azar)
+    - sin_cache: vacía la caché del Backend antes de cada llamada, para medir la base de datos
+
+    Retorna:
+    dict: latencias p50/p95/p99/media/máxima en milisegundos y operaciones por segundo
+    """
+    operacion = OPERACIONES[nombre]
+    por_hilo = [llamadas // hilos + (1 if i < llamadas % hilos else 0) for i in range(hilos)]
+
+    def trabajar(indice):
+        rng = random.Random(semilla * 1000 + indice)
+        # Llamada de calentamiento sin medir: abre la conexión de este hilo
+        operacion(rng, datos)
+        tiempos = []
+        for _ in range(por_hilo[indice]):
+            if sin_cache:
+                Backend.limpiar_cache()
+            inicio = time.perf_counter()
+            operacion(rng, datos)
+            tiempos.append(time.perf_counter() - inicio)
+        return tiempos
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        inicio = time.perf_counter()
+        tiempos = [t for lista in pool.map(trabajar, range(hilos)) for t in lista]
+        duracion = time.perf_counter() - inicio
+
+    tiempos.sort()
+    ms = [t * 1000 for t in tiempos]
+    return {
+        "operacion": nombre,
+        "hilos": hilos,
+        "llamadas": len(ms),
+        "p50_ms": round(percentil(ms, 50), 4),
+        "p95_ms": round(percentil(ms, 95), 4),
+        "p99_ms": round(percentil(ms, 99), 4),
+        "media_ms": round(sum(ms) / len(ms), 4) if ms else 0.0,
+        "max_ms": round(ms[-1], 4) if ms else 0.0,
+        "ops_por_segundo": round(len(ms) / duracion, 2) if duracion else 0.0,
+    }
+
+
+def datos_para_medir(cantidades):
+    """Agrega a las cantidades generadas lo que necesitan las operaciones para elegir argumentos."""
+    return dict(cantidades, terminos=terminos_busqueda())
+
+
+def comparar_con_base(resultados, base, tolerancia=0.2, minimo_ms=0.05):
+    """
+    Compara resultados con una corrida anterior.
+
+    Una operación se considera más lenta si su p95 supera al de la base en más de
+    `tolerancia` (0.2 = 20 %) y en más de `minimo_ms` (para ignorar ruido en operaciones
+    muy rápidas). Se comparan sólo las combinaciones (escala, hilos, operación) que estén en ambas.
+
+    Retorna:
+    list: dicts con escala, hilos, operación, p95 anterior, p95 actual y cambio relativo
+    """
+    anteriores = {(r["escala"], r["hilos"], r["operacion"]): r for r in base.get("resultados", [])}
+    regresiones = []
+    for r in resultados:
+        anterior = anteriores.get((r["escala"], r["hilos"], r["operacion"]))
+        if anterior is None:
+            continue
+        antes, ahora = anterior["p95_ms"], r["p95_ms"]
+        if ahora - antes > minimo_ms and ahora > antes * (1 + tolerancia):
+            regresiones.append({
+                "escala": r["escala"],
+                "hilos": r["hilos"],
+                "operacion": r["operacion"],
+                "p95_base_ms": antes,
+                "p95_ms": ahora,
+                "cambio": round(ahora / antes - 1, 3) if antes else None,
+            })
+    return regresiones
@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+CAPACIDAD = 256      # Cantidad máxima de consultas guardadas (las menos usadas se descartan primero)
+MAX_FILAS = 100000   # Filas guardadas entre todas las consultas; un resultado más grande no se guarda
+
+
+class CacheConsultas:
+    """
+    Caché en memoria para resultados de consultas de sólo lectura.
+
+    Cada resultado se guarda junto con las tablas de las que depende. Cuando el Backend
+    escribe en una tabla llama a invalidar(tabla) y se borran los resultados que dependen de ella.
+
+    Para notar escrituras que el Backend no avisó (por ejemplo, otro proceso usando el
+    mismo archivo) se mira PRAGMA data_version en una única conexión "sonda": SQLite lo
+    cambia cada vez que otra conexión confirma cambios. Las escrituras del propio Backend
+    también lo cambian, así que el Backend:
+    1) llama a revisar_cambios_externos() con el candado de escritura ya tomado y antes de
+       confirmar; así cualquier cambio externo previo vacía la caché y no queda "explicado"
+       por nuestra escritura;
+    2) después de confirmar llama a invalidar(), que toma el valor actual como nueva referencia.
+    (Una escritura externa que se confirme justo entre el COMMIT del Backend y su invalidar()
+    todavía puede pasar desapercibida.)
+    """
+
+    def __init__(self, capacidad=CAPACIDAD, max_filas=MAX_FILAS, sonda=None):
+        """
+        sonda: función sin argumentos que devuelve la conexión donde leer PRAGMA data_version
+        (siempre se usa con el candado de la caché tomado). Sin sonda no se revisan
+        cambios externos.
+        """
+        self.capacidad = capacidad
+        self.max_filas = max_filas
+        self._sonda = sonda
+        self._datos = OrderedDict()     # clave -> (tablas, valor, filas); el final es lo más usado
+        self._filas = 0                 # Suma de filas de todos los resultados guardados
+        self._lock = threading.Lock()
+        self._visto = None              # (conexión sonda, data_version) de la última revisión
+        self._generacion = 0            # Aumenta en cada invalidación
+        self.aciertos = 0
+        self.fallos = 0
+        self.descartes = 0              # Resultados sacados por falta de espacio (LRU)
+        self.invalidaciones = 0         # Resultados borrados por escrituras
+
+    def obtener(self, clave, tablas, calcular):
+        """
+        Devuelve el resultado guardado para `clave` o, si no está, lo calcula con calcular()
+        y lo guarda.
+
+        Parámetros:
+        - clave: identifica la consulta y sus parámetros (debe ser hashable)
+        - tablas: tablas de las que depende el resultado
+        - calcular: función sin argumentos que hace la consulta
+        """
+        with self._lock:
+            self._revisar_cambios_externos()
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave][1]
+            self.fallos += 1
+            generacion = self._generacion
+
+        valor = calcular()
+        filas = len(valor) if isinstance(valor, (list, tuple)) else 1
+
+        with self._lock:
+            # Si alguien escribió mientras consultábamos, el valor puede estar viejo: no lo guardamos.
+            # Tampoco guardamos resultados que por sí solos superan el límite de filas
+            if generacion == self._generacion and clave not in self._datos and filas <= self.max_filas:
+                self._datos[clave] = (frozenset(tablas), valor, filas)
+                self._filas += filas
+                while len(self._datos) > self.capacidad or self._filas > self.max_filas:
+                    _, (_, _, descartadas) = self._datos.popitem(last=False)
+                    self._filas -= descartadas
+                    self.descartes += 1
+        return valor
+
+    def invalidar(self, *tablas):
+        """Borra los resultados que dependen de alguna de `tablas` (todas si no se indica ninguna)."""
+        with self._lock:
+            self._borrar(tablas)
+            # La escritura que provocó esta invalidación ya está explicada: el data_version
+            # actual pasa a ser la referencia para detectar cambios externos
+            self._visto = self._leer_version()
+
+    def revisar_cambios_externos(self):
+        """
+        Vacía la caché si la base cambió sin que el Backend lo avisara.
+        Se llama antes de cada escritura del Backend (ver Backend._escritura).
+        """
+        with self._lock:
+            self._revisar_cambios_externos()
+
+    def _borrar(self, tablas=()):
+        """Borra los resultados que dependen de `tablas` (todos si está vacío). Requiere el candado."""
+        self._generacion += 1
+        if not tablas:
+            borrar = list(self._datos)
+        else:
+            borrar = [clave for clave, (dependencias, _, _) in self._datos.items()
+                      if dependencias.intersection(tablas)]
+        for clave in borrar:
+            self._filas -= self._datos.pop(clave)[2]
+        self.invalidaciones += len(borrar)
+
+    def _leer_version(self):
+        """(conexión sonda, data_version), o None si no hay sonda o no se pudo leer."""
+        if self._sonda is None:
+            return None
+        try:
+            conn = self._sonda()
+            return conn, conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def _revisar_cambios_externos(self):
+        """Vacía la caché si la base cambió sin que el Backend lo avisara. Requiere el candado."""
+        if self._sonda is None:
+            return
+        actual = self._leer_version()
+        # Una sonda nueva (por ejemplo, tras conexion.configurar_db) no sabe qué pasó
+        # antes de abrirse, así que también vaciamos
+        if actual is None or actual != self._visto:
+            self._borrar()
+            self._visto = actual
+
+    def estadisticas(self):
+        """Contadores de uso, para comprobar que la caché está sirviendo."""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "descartes": self.descartes,
+                "invalidaciones": self.invalidaciones,
+                "entradas": len(self._datos),
+                "capacidad": self.capacidad,
+                "filas": self._filas,
+                "max_filas": self.max_filas,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            }
+
+    def reiniciar_estadisticas(self):
+        with self._lock:
+            self.aciertos = self.fallos = self.descartes = self.invalidaciones = 0
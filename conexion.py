@@ -0,0 +1,481 @@
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+
+# Nombre del archivo de nuestra base de datos.
+# Para usar otro archivo hay que llamar a configurar_db(ruta): asignar esta variable
+# (o Backend.DB_NAME, como antes) no cierra las conexiones ya abiertas.
+DB_NAME = "usuarios.db"
+
+# Ajustes que se aplican a cada conexión nueva
+BUSY_TIMEOUT_MS = 5000      # Cuánto esperamos (en ms) si otra conexión tiene la base bloqueada
+CACHE_KIB = 20000           # Tamaño de la caché de páginas en KiB (valor negativo en el PRAGMA)
+REINTENTOS_BLOQUEO = 2      # Veces que se reintenta BEGIN IMMEDIATE si la base sigue bloqueada
+PAUSA_REINTENTO_S = 0.1     # Pausa antes de cada reintento (crece con cada intento)
+
+# Cada hilo guarda aquí su propia conexión (sqlite3 no permite compartirlas entre hilos)
+_local = threading.local()
+
+# Candado para que el esquema se cree una sola vez aunque varios hilos arranquen a la vez
+_lock_esquema = threading.Lock()
+_esquema_listo = set()      # Rutas de bases de datos cuyo esquema ya revisamos en este proceso
+
+# Todas las conexiones abiertas, para poder cerrarlas al cambiar de base de datos.
+# Referencias débiles: cuando un hilo termina, su threading.local se borra y la
+# conexión se cierra sola; esta lista no debe mantenerla viva.
+_conexiones = weakref.WeakSet()
+_lock_conexiones = threading.Lock()
+_generacion = 0             # Aumenta cada vez que se cierran las conexiones; invalida las de cada hilo
+_sonda = None               # (generación, conexión) compartida por todos los hilos, ver obtener_sonda()
+
+# Si no es None, mide cada sentencia y recibe los avisos de espera por el candado
+# de escritura (ver diagnostico.py). Con None el único costo es revisar esta variable.
+observador = None
+
+
+# ==================== MIGRACIONES ====================
+# Cada migración es una tupla (versión, sql). Se ejecutan en orden y sólo las que
+# tengan una versión mayor que el PRAGMA user_version guardado en la base.
+# Para cambiar el esquema se agrega una migración nueva al final, nunca se edita una vieja.
+MIGRACIONES = [
+    (1, """
+        -- tabla usuarios
+        CREATE TABLE IF NOT EXISTS usuarios (
+            username TEXT PRIMARY KEY,    -- Nombre de usuario (único, no se puede repetir)
+            password TEXT NOT NULL,       -- Contraseña (obligatoria)
+            email TEXT NOT NULL,          -- Correo electrónico (obligatorio)
+            role TEXT NOT NULL            -- Tipo de usuario: "user", "admin", etc. (obligatorio)
+        );
+
+        -- tabla productos
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,   -- ID único para cada producto (se incrementa automáticamente)
+            categoria TEXT,                        -- Categoría del producto (opcional)
+            nombre TEXT NOT NULL,                  -- Nombre del producto (obligatorio)
+            precio REAL NOT NULL                   -- Precio del producto (obligatorio)
+        );
+
+        -- tabla pedidos
+        CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario TEXT NOT NULL,
+            producto_id INTEGER NOT NULL,
+            cantidad INTEGER NOT NULL,
+            fecha TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (producto_id) REFERENCES productos(id)
+        );
+    """),
+    (2, """
+        -- Índice de texto completo para buscar productos por nombre y categoría.
+        -- Es una tabla "external content": no guarda copia de los datos, los lee de productos.
+        -- unicode61 remove_diacritics 2 hace que "loción" y "locion" coincidan.
+        -- prefix='2 3' acelera las búsquedas por prefijo cortas ("ca*", "cam*").
+        CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+            nombre,
+            categoria,
+            content='productos',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        );
+
+        -- Triggers para mantener el índice sincronizado con la tabla productos
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts(rowid, nombre, categoria)
+            VALUES (new.id, new.nombre, new.categoria);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts(productos_fts, rowid, nombre, categoria)
+            VALUES ('delete', old.id, old.nombre, old.categoria);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE ON productos BEGIN
+            INSERT INTO productos_fts(productos_fts, rowid, nombre, categoria)
+            VALUES ('delete', old.id, old.nombre, old.categoria);
+            INSERT INTO productos_fts(rowid, nombre, categoria)
+            VALUES (new.id, new.nombre, new.categoria);
+        END;
+
+        -- Bases de datos existentes: construimos el índice con los productos que ya hay
+        INSERT INTO productos_fts(productos_fts) VALUES ('rebuild');
+    """),
+    (3, """
+        -- Historial de pedidos por usuario, del más reciente al más antiguo.
+        -- El índice incluye el rowid (id), así que también sirve para desempatar fechas iguales.
+        CREATE INDEX IF NOT EXISTS idx_pedidos_usuario_fecha ON pedidos(usuario, fecha);
+    """),
+    (4, """
+        -- Resúmenes de ventas que se mantienen al día con cada pedido, para que los reportes
+        -- no tengan que recorrer todo el historial. Sólo guardamos unidades: los ingresos se
+        -- calculan con el precio actual del producto, igual que el reporte original.
+        CREATE TABLE IF NOT EXISTS ventas_producto (
+            producto_id INTEGER PRIMARY KEY,      -- Producto vendido
+            unidades INTEGER NOT NULL DEFAULT 0   -- Unidades vendidas en toda la historia
+        );
+
+        CREATE TABLE IF NOT EXISTS ventas_producto_dia (
+            producto_id INTEGER NOT NULL,         -- Producto vendido
+            dia TEXT NOT NULL,                    -- Día de la venta (YYYY-MM-DD)
+            unidades INTEGER NOT NULL DEFAULT 0,  -- Unidades vendidas ese día
+            PRIMARY KEY (producto_id, dia)
+        ) WITHOUT ROWID;
+
+        -- Para consultar rangos de fechas sin importar el producto
+        CREATE INDEX IF NOT EXISTS idx_ventas_producto_dia_dia ON ventas_producto_dia(dia);
+
+        -- Cada pedido nuevo suma sus unidades a los dos resúmenes
+        CREATE TRIGGER IF NOT EXISTS pedidos_resumen_ai AFTER INSERT ON pedidos BEGIN
+            INSERT INTO ventas_producto(producto_id, unidades)
+            VALUES (new.producto_id, new.cantidad)
+            ON CONFLICT(producto_id) DO UPDATE SET unidades = unidades + excluded.unidades;
+
+            INSERT INTO ventas_producto_dia(producto_id, dia, unidades)
+            SELECT new.producto_id, date(new.fecha), new.cantidad
+            WHERE date(new.fecha) IS NOT NULL
+            ON CONFLICT(producto_id, dia) DO UPDATE SET unidades = unidades + excluded.unidades;
+        END;
+
+        -- Si se borra un pedido, restamos sus unidades
+        CREATE TRIGGER IF NOT EXISTS pedidos_resumen_ad AFTER DELETE ON pedidos BEGIN
+            UPDATE ventas_producto SET unidades = unidades - old.cantidad
+            WHERE producto_id = old.producto_id;
+
+            UPDATE ventas_producto_dia SET unidades = unidades - old.cantidad
+            WHERE producto_id = old.producto_id AND dia = date(old.fecha);
+        END;
+
+        -- Si se modifica un pedido, restamos lo viejo y sumamos lo nuevo
+        CREATE TRIGGER IF NOT EXISTS pedidos_resumen_au AFTER UPDATE OF producto_id, cantidad, fecha ON pedidos BEGIN
+            UPDATE ventas_producto SET unidades = unidades - old.cantidad
+            WHERE producto_id = old.producto_id;
+
+            UPDATE ventas_producto_dia SET unidades = unidades - old.cantidad
+            WHERE producto_id = old.producto_id AND dia = date(old.fecha);
+
+            INSERT INTO ventas_producto(producto_id, unidades)
+            VALUES (new.producto_id, new.cantidad)
+            ON CONFLICT(producto_id) DO UPDATE SET unidades = unidades + excluded.unidades;
+
+            INSERT INTO ventas_producto_dia(producto_id, dia, unidades)
+            SELECT new.producto_id, date(new.fecha), new.cantidad
+            WHERE date(new.fecha) IS NOT NULL
+            ON CONFLICT(producto_id, dia) DO UPDATE SET unidades = unidades + excluded.unidades;
+        END;
+
+        -- Bases de datos existentes: llenamos los resúmenes con el historial que ya hay
+        INSERT OR REPLACE INTO ventas_producto(producto_id, unidades)
+        SELECT producto_id, SUM(cantidad) FROM pedidos GROUP BY producto_id;
+
+        INSERT OR REPLACE INTO ventas_producto_dia(producto_id, dia, unidades)
+        SELECT producto_id, date(fecha), SUM(cantidad) FROM pedidos
+        WHERE date(fecha) IS NOT NULL
+        GROUP BY producto_id, date(fecha);
+    """),
+]
+
+SCHEMA_VERSION = MIGRACIONES[-1][0]
+
+
+class _CursorMedido(sqlite3.Cursor):
+    """
+    Cursor que se entrega mientras hay un observador (ver _Conexion.cursor).
+
+    El tiempo de una sentencia incluye el de leer sus filas: execute() sólo corre el primer
+    paso de una consulta, el resto lo hacen fetchone/fetchmany/fetchall o la iteración.
+    Por eso el observador recibe la sentencia cuando se terminan las filas, cuando el cursor
+    se cierra o se vuelve a usar, o cuando se descarta.
+    """
+
+    _medicion = None   # [observador, sql, parámetros, segundos acumulados, es executemany]
+
+    def execute(self, sql, parametros=()):
+        return self._ejecutar(super().execute, sql, parametros, False)
+
+    def executemany(self, sql, filas):
+        return self._ejecutar(super().executemany, sql, filas, True)
+
+    def _ejecutar(self, ejecutar, sql, parametros, muchas):
+        self._terminar()
+        # Leemos `observador` una sola vez: otro hilo puede desactivarlo en cualquier momento
+        obs = observador
+        if obs is None:
+            return ejecutar(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            ejecutar(sql, parametros)
+        except sqlite3.Error as e:
+            obs.sentencia_fallida(sql, time.perf_counter() - inicio, e)
+            raise
+        self._medicion = [obs, sql, parametros, time.perf_counter() - inicio, muchas]
+        if self.description is None:
+            self._terminar()   # No devuelve filas (INSERT, PRAGMA de escritura...): ya terminó
+        return self
+
+    def _leer(self, leer, *args):
+        medicion = self._medicion
+        if medicion is None:
+            return leer(*args)
+        inicio = time.perf_counter()
+        try:
+            return leer(*args)
+        finally:
+            medicion[3] += time.perf_counter() - inicio
+
+    def fetchone(self):
+        fila = self._leer(super().fetchone)
+        if fila is None:
+            self._terminar()
+        return fila
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        filas = self._leer(super().fetchmany, size)
+        if len(filas) < size:
+            self._terminar()
+        return filas
+
+    def fetchall(self):
+        filas = self._leer(super().fetchall)
+        self._terminar()
+        return filas
+
+    def __next__(self):
+        try:
+            return self._leer(super().__next__)
+        except StopIteration:
+            self._terminar()
+            raise
+
+    def close(self):
+        self._terminar()
+        super().close()
+
+    def __del__(self):
+        self._terminar()
+
+    def _terminar(self):
+        """Le entrega al observador la sentencia en curso, si hay una."""
+        medicion = self._medicion
+        if medicion is None:
+            return
+        self._medicion = None
+        obs, sql, parametros, segundos, muchas = medicion
+        obs.sentencia_terminada(self.connection, sql, parametros, segundos, muchas)
+
+
+class _Conexion(sqlite3.Connection):
+    """
+    Conexión que entrega cursores medidos sólo mientras hay un observador; si no, cursores
+    comunes de sqlite3, así que con la instrumentación apagada leer filas no cuesta nada extra.
+    sqlite3.Connection.execute no pasa por cursor(), así que lo redirigimos.
+    """
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = sqlite3.Cursor if observador is None else _CursorMedido
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, filas):
+        return self.cursor().executemany(sql, filas)
+
+
+def _nueva_conexion(ruta):
+    """
+    Abre una conexión a la base de datos y le aplica los ajustes de rendimiento.
+    """
+    # isolation_level=None: nosotros controlamos las transacciones con transaccion()
+    conn = sqlite3.connect(ruta, timeout=BUSY_TIMEOUT_MS / 1000, factory=_Conexion,
+                           isolation_level=None, check_same_thread=False)
+
+    # WAL permite que haya lectores mientras alguien escribe
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Con WAL, NORMAL es seguro ante caídas de la aplicación y hace muchos menos fsync
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    with _lock_conexiones:
+        _conexiones.add(conn)
+        if observador is not None:
+            conn.set_trace_callback(observador.trazar)
+    return conn
+
+
+def inicializar_esquema(conn, ruta=None):
+    """
+    Aplica las migraciones pendientes en la base de datos.
+    Sólo trabaja la primera vez por proceso: después de eso no vuelve a tocar el esquema.
+    """
+    ruta = ruta or DB_NAME
+    if ruta in _esquema_listo:
+        return
+
+    with _lock_esquema:
+        if ruta in _esquema_listo:
+            return
+
+        # Arranque en caliente: el esquema ya está al día, no ejecutamos ningún DDL
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            # BEGIN IMMEDIATE para que dos procesos no migren al mismo tiempo
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Volvemos a leer la versión: otro proceso pudo migrar mientras esperábamos
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for numero, sql in MIGRACIONES:
+                    if numero > version:
+                        for sentencia in _separar_sentencias(sql):
+                            conn.execute(sentencia)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+        _esquema_listo.add(ruta)
+
+
+def _separar_sentencias(sql):
+    """
+    Divide un bloque de SQL en sentencias completas.
+    Usamos sqlite3.complete_statement para no cortar triggers (que llevan ; por dentro).
+    """
+    sentencias = []
+    actual = ""
+    for linea in sql.splitlines(keepends=True):
+        actual += linea
+        if sqlite3.complete_statement(actual):
+            if actual.strip():
+                sentencias.append(actual.strip())
+            actual = ""
+    if actual.strip() and not actual.strip().startswith("--"):
+        sentencias.append(actual.strip())
+    return sentencias
+
+
+def obtener_conexion():
+    """
+    Devuelve la conexión del hilo actual, creándola (y preparando el esquema) si hace falta.
+    La conexión se reutiliza en todas las llamadas siguientes del mismo hilo.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generacion != _generacion:
+        conn = _nueva_conexion(DB_NAME)
+        _local.conn = conn
+        _local.generacion = _generacion
+    inicializar_esquema(conn, DB_NAME)
+    return conn
+
+
+def obtener_sonda():
+    """
+    Conexión compartida entre hilos que sólo sirve para leer PRAGMA data_version
+    (la usa la caché del Backend para notar escrituras de otros procesos).
+    Quien la use debe asegurarse de que dos hilos no la usen a la vez.
+    """
+    global _sonda
+    if _sonda is None or _sonda[0] != _generacion:
+        _sonda = (_generacion, _nueva_conexion(DB_NAME))
+    return _sonda[1]
+
+
+@contextmanager
+def transaccion(inmediata=False):
+    """
+    Abre una transacción en la conexión del hilo actual.
+    Hace COMMIT al salir normalmente y ROLLBACK si ocurre una excepción.
+
+    inmediata=True toma el candado de escritura desde el principio (BEGIN IMMEDIATE),
+    útil cuando sabemos que vamos a escribir. Si otra conexión tiene el candado por más
+    de BUSY_TIMEOUT_MS, se reintenta hasta REINTENTOS_BLOQUEO veces antes de fallar.
+    """
+    conn = obtener_conexion()
+    _comenzar(conn, inmediata)
+    try:
+        yield conn
+    except BaseException:
+        # SQLite pudo haber deshecho la transacción por su cuenta (por ejemplo, disco lleno);
+        # un ROLLBACK sin transacción fallaría y taparía el error original
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+
+
+def _comenzar(conn, inmediata):
+    """BEGIN de transaccion(), con reintentos si la base está bloqueada."""
+    if not inmediata:
+        # BEGIN (diferido) no toma ningún candado, así que no puede quedar esperando
+        conn.execute("BEGIN")
+        return
+
+    intento = 0
+    while True:
+        inicio = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            bloqueada = "locked" in str(e)
+            reintentar = bloqueada and intento < REINTENTOS_BLOQUEO
+            obs = observador
+            if obs is not None and bloqueada:
+                obs.espera_bloqueo(time.perf_counter() - inicio, "reintento" if reintentar else "fallo")
+            if not reintentar:
+                raise
+            intento += 1
+            time.sleep(PAUSA_REINTENTO_S * intento)
+        else:
+            obs = observador
+            if obs is not None:
+                obs.espera_bloqueo(time.perf_counter() - inicio, "obtenido")
+            return
+
+
+def cerrar_conexiones():
+    """
+    Cierra todas las conexiones abiertas por este módulo (de cualquier hilo).
+    """
+    global _generacion
+    with _lock_conexiones:
+        abiertas = list(_conexiones)
+        _conexiones.clear()
+        _generacion += 1
+    for conn in abiertas:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def configurar_observador(nuevo):
+    """
+    Instala (o quita, con None) el observador de sentencias en todas las conexiones,
+    incluido su trace callback. Lo usa diagnostico.activar()/desactivar().
+    """
+    global observador
+    with _lock_conexiones:
+        observador = nuevo
+        for conn in _conexiones:
+            conn.set_trace_callback(nuevo.trazar if nuevo is not None else None)
+
+
+def configurar_db(ruta):
+    """
+    Cambia el archivo de base de datos que usa la aplicación.
+    Las conexiones a la base anterior se cierran; cada hilo abrirá una nueva al usarla.
+    """
+    global DB_NAME
+    cerrar_conexiones()
+    with _lock_esquema:
+        _esquema_listo.discard(ruta)
+    DB_NAME = ruta
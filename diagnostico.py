@@ -0,0 +1,408 @@
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import wraps
+
+import conexion
+
+
+# ==================== AJUSTES ====================
+UMBRAL_LENTA_MS = 100                   # Sentencias que tardan más que esto van al registro de lentas
+ARCHIVO_LENTAS = "consultas_lentas.log" # Registro de sentencias lentas (None = no escribir); una ruta
+                                        # relativa se toma desde la carpeta de la base de datos
+LIMITES_MS = (1, 5, 10, 50, 100, 500, 1000)  # Cubetas del histograma de latencias (la última es "más de 1000")
+MAX_LENTAS = 100                        # Sentencias lentas que se guardan en memoria para la ventana de diagnóstico
+MAX_TRAZAS = 200                        # Últimas sentencias vistas por el trace callback
+MAX_SENTENCIAS = 500                    # Sentencias distintas con contadores propios (el resto va a "(otras)")
+
+# Estado global. Con _activo en False las funciones instrumentadas sólo miran esa variable.
+_activo = False
+_umbral_ms = UMBRAL_LENTA_MS
+_archivo_lentas = ARCHIVO_LENTAS
+
+_lock = threading.Lock()
+_lock_archivo = threading.Lock()   # Sólo para escribir el registro de lentas; no frena a las demás métricas
+_local = threading.local()   # Función del Backend que está corriendo en cada hilo
+
+
+def _metricas_vacias():
+    return {
+        "desde": datetime.now().isoformat(timespec="seconds"),
+        "funciones": {},        # nombre -> llamadas, errores, tiempos, filas, histograma
+        "sentencias": {},       # SQL -> ejecuciones, errores, tiempos
+        "trazadas": 0,          # Sentencias que pasaron por el trace callback (incluye triggers y migraciones)
+        "ultimas_trazas": deque(maxlen=MAX_TRAZAS),
+        "lentas": deque(maxlen=MAX_LENTAS),
+        "total_lentas": 0,
+        "bloqueos": {
+            "esperas": 0,           # BEGIN IMMEDIATE que consiguieron el candado de escritura
+            "espera_total_ms": 0.0,
+            "espera_max_ms": 0.0,
+            "reintentos": 0,        # "database is locked" en BEGIN IMMEDIATE que se volvieron a intentar
+            "fallos": 0,            # BEGIN IMMEDIATE que se rindieron tras los reintentos
+            "errores_bloqueo": 0,   # Sentencias (de cualquier tipo) que fallaron con "database is locked"
+        },
+    }
+
+_metricas = _metricas_vacias()
+
+
+# ==================== ACTIVAR / DESACTIVAR ====================
+def activar(umbral_ms=None, archivo_lentas=False):
+    """
+    Empieza a medir las funciones del Backend y las sentencias SQL.
+
+    Parámetros:
+    - umbral_ms: sentencias más lentas que esto se anotan en el registro de lentas
+    - archivo_lentas: archivo del registro de lentas (None para sólo guardarlas en memoria);
+      si no se indica se mantiene el anterior
+    """
+    global _activo, _umbral_ms, _archivo_lentas
+    if umbral_ms is not None:
+        _umbral_ms = umbral_ms
+    if archivo_lentas is not False:
+        _archivo_lentas = archivo_lentas
+    _activo = True
+    conexion.configurar_observador(_observador)
+
+def desactivar():
+    """Deja de medir. Las métricas acumuladas se conservan hasta llamar a reiniciar_metricas()."""
+    global _activo
+    _activo = False
+    conexion.configurar_observador(None)
+
+def esta_activo():
+    return _activo
+
+def umbral_lenta_ms():
+    return _umbral_ms
+
+def reiniciar_metricas():
+    """Borra todas las métricas acumuladas."""
+    global _metricas
+    with _lock:
+        _metricas = _metricas_vacias()
+
+
+# ==================== FUNCIONES DEL BACKEND ====================
+def instrumentar(funcion):
+    """
+    Decorador para las funciones públicas del Backend: cuenta llamadas, errores, tiempo
+    y filas devueltas. Los generadores se miden sólo mientras producen filas, no mientras
+    quien los consume hace otra cosa (por ejemplo, escribir el archivo de una exportación).
+    """
+    nombre = funcion.__name__
+
+    if inspect.isgeneratorfunction(funcion):
+        @wraps(funcion)
+        def envoltura_generador(*args, **kwargs):
+            if not _activo:
+                yield from funcion(*args, **kwargs)
+                return
+            generador = funcion(*args, **kwargs)
+            segundos = 0.0
+            filas = 0
+            error = False
+            try:
+                while True:
+                    anterior = getattr(_local, "funcion", None)
+                    _local.funcion = nombre
+                    inicio = time.perf_counter()
+                    try:
+                        fila = next(generador)
+                    except StopIteration:
+                        return
+                    except BaseException:
+                        error = True
+                        raise
+                    finally:
+                        segundos += time.perf_counter() - inicio
+                        _local.funcion = anterior
+                    filas += 1
+                    yield fila
+            finally:
+                generador.close()
+                _registrar_funcion(nombre, segundos, filas, error)
+        return envoltura_generador
+
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not _activo:
+            return funcion(*args, **kwargs)
+        anterior = getattr(_local, "funcion", None)
+        _local.funcion = nombre
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except BaseException:
+            _registrar_funcion(nombre, time.perf_counter() - inicio, 0, error=True)
+            raise
+        finally:
+            _local.funcion = anterior
+        _registrar_funcion(nombre, time.perf_counter() - inicio, _contar_filas(resultado))
+        return resultado
+    return envoltura
+
+def _contar_filas(resultado):
+    """Filas devueltas por una función del Backend (o insertadas, en las cargas masivas)."""
+    if isinstance(resultado, list):
+        return len(resultado)
+    if isinstance(resultado, tuple):
+        return 1
+    if isinstance(resultado, dict) and "insertados" in resultado:
+        return resultado["insertados"]
+    return 0
+
+def _histograma_vacio():
+    return [0] * (len(LIMITES_MS) + 1)
+
+def _registrar_funcion(nombre, segundos, filas, error=False):
+    ms = segundos * 1000
+    with _lock:
+        datos = _metricas["funciones"].get(nombre)
+        if datos is None:
+            datos = _metricas["funciones"][nombre] = {
+                "llamadas": 0, "errores": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "filas": 0, "histograma": _histograma_vacio(),
+            }
+        datos["llamadas"] += 1
+        datos["errores"] += error
+        datos["total_ms"] += ms
+        datos["max_ms"] = max(datos["max_ms"], ms)
+        datos["filas"] += filas
+        datos["histograma"][bisect_left(LIMITES_MS, ms)] += 1
+
+
+# ==================== SENTENCIAS SQL ====================
+# Literales de texto y números: se reemplazan por ? antes de guardar una sentencia
+# trazada, para no dejar contraseñas en memoria ni en los archivos de métricas.
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+def _normalizar(sql):
+    return _ESPACIOS.sub(" ", sql).strip()
+
+def _es_bloqueo(error):
+    return "locked" in str(error)
+
+
+class _Observador:
+    """
+    Lo que conexion.py llama mientras la instrumentación está activa
+    (ver conexion.configurar_observador).
+    """
+
+    def trazar(self, sql):
+        """Trace callback de sqlite3: se llama con cada sentencia, ya con los parámetros puestos."""
+        texto = _LITERALES.sub("?", _normalizar(sql))
+        with _lock:
+            _metricas["trazadas"] += 1
+            _metricas["ultimas_trazas"].append(texto)
+
+    def sentencia_terminada(self, conn, sql, parametros, segundos, muchas=False):
+        """
+        Aviso de conexion._CursorMedido cuando una sentencia terminó (incluido el tiempo de
+        leer sus filas). Si superó el umbral se anota como lenta, con su plan.
+        """
+        self._registrar(sql, segundos)
+        if segundos * 1000 >= _umbral_ms:
+            # Con executemany no tenemos una fila de parámetros a mano para pedir el plan
+            plan = None if muchas else _plan(conn, sql, parametros)
+            _registrar_lenta(sql, segundos, plan)
+
+    def sentencia_fallida(self, sql, segundos, error):
+        """Aviso de conexion._CursorMedido cuando una sentencia lanzó un error de SQLite."""
+        self._registrar(sql, segundos, error=error)
+
+    def _registrar(self, sql, segundos, error=None):
+        ms = segundos * 1000
+        clave = _normalizar(sql)
+        with _lock:
+            sentencias = _metricas["sentencias"]
+            datos = sentencias.get(clave)
+            if datos is None:
+                if len(sentencias) >= MAX_SENTENCIAS:
+                    clave = "(otras)"
+                datos = sentencias.setdefault(clave, {"ejecuciones": 0, "errores": 0,
+                                                      "total_ms": 0.0, "max_ms": 0.0})
+            datos["ejecuciones"] += 1
+            datos["total_ms"] += ms
+            datos["max_ms"] = max(datos["max_ms"], ms)
+            if error is not None:
+                datos["errores"] += 1
+                if _es_bloqueo(error):
+                    _metricas["bloqueos"]["errores_bloqueo"] += 1
+
+    def espera_bloqueo(self, segundos, resultado):
+        """
+        Aviso de conexion.transaccion sobre BEGIN IMMEDIATE.
+        resultado es "obtenido", "reintento" o "fallo".
+        """
+        ms = segundos * 1000
+        with _lock:
+            bloqueos = _metricas["bloqueos"]
+            if resultado == "obtenido":
+                bloqueos["esperas"] += 1
+                bloqueos["espera_total_ms"] += ms
+                bloqueos["espera_max_ms"] = max(bloqueos["espera_max_ms"], ms)
+            elif resultado == "reintento":
+                bloqueos["reintentos"] += 1
+            else:
+                bloqueos["fallos"] += 1
+
+_observador = _Observador()
+
+
+def _plan(conn, sql, parametros):
+    """
+    EXPLAIN QUERY PLAN de una sentencia, como lista de líneas con sangría.
+    Usa un cursor común de sqlite3 para que la consulta del plan no se mida a sí misma.
+    """
+    try:
+        filas = sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+    except (sqlite3.Error, ValueError) as e:
+        return [f"(plan no disponible: {e})"]
+    # Cada fila es (id, padre, sin uso, detalle); la profundidad sale de seguir los padres
+    niveles = {0: -1}
+    lineas = []
+    for id_, padre, _, detalle in filas:
+        niveles[id_] = niveles.get(padre, -1) + 1
+        lineas.append("  " * niveles[id_] + detalle)
+    return lineas
+
+def _registrar_lenta(sql, segundos, plan):
+    """Guarda una sentencia lenta en memoria y, si hay archivo configurado, la anota en él."""
+    entrada = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "ms": round(segundos * 1000, 3),
+        "funcion": getattr(_local, "funcion", None),
+        "sql": _normalizar(sql),
+        "plan": plan,
+    }
+    with _lock:
+        _metricas["lentas"].append(entrada)
+        _metricas["total_lentas"] += 1
+
+    archivo = ruta_registro_lentas()
+    if archivo:
+        try:
+            with _lock_archivo, open(archivo, "a", encoding="utf-8") as f:
+                f.write(_formatear_lenta(entrada) + "\n")
+        except OSError:
+            pass  # El registro en disco es opcional: no interrumpimos la consulta
+
+def ruta_registro_lentas():
+    """Archivo donde se anotan las sentencias lentas, o None si no se escriben en disco."""
+    if not _archivo_lentas:
+        return None
+    carpeta = os.path.dirname(os.path.abspath(conexion.DB_NAME))
+    return os.path.join(carpeta, _archivo_lentas)
+
+def _formatear_lenta(entrada):
+    lineas = [f"[{entrada['fecha']}] {entrada['ms']:.1f} ms en {entrada['funcion'] or '(fuera del Backend)'}",
+              f"  SQL: {entrada['sql']}"]
+    if entrada["plan"] is None:
+        lineas.append("  Plan: no disponible (executemany)")
+    elif not entrada["plan"]:
+        lineas.append("  Plan: (vacío, no es una consulta)")
+    else:
+        lineas.append("  Plan:")
+        lineas.extend("    " + linea for linea in entrada["plan"])
+    return "\n".join(lineas)
+
+
+# ==================== LECTURA DE MÉTRICAS ====================
+def metricas():
+    """
+    Copia de las métricas acumuladas, lista para leer desde Python o guardar como JSON.
+
+    Retorna:
+    dict con:
+    - funciones: por función del Backend, llamadas, errores, tiempo total/medio/máximo,
+      filas y histograma de latencias (una cubeta por cada límite de LIMITES_MS y una más)
+    - sentencias: por sentencia SQL, ejecuciones, errores y tiempo total/medio/máximo
+    - trazadas / ultimas_trazas: sentencias vistas por el trace callback de sqlite3
+    - lentas / total_lentas: sentencias que superaron el umbral, con su plan
+    - bloqueos: esperas por el candado de escritura, reintentos y fallos por "database is locked"
+    """
+    with _lock:
+        m = _metricas
+        funciones = {
+            nombre: dict(datos, histograma=list(datos["histograma"]),
+                         media_ms=datos["total_ms"] / datos["llamadas"])
+            for nombre, datos in m["funciones"].items()
+        }
+        sentencias = {
+            sql: dict(datos, media_ms=datos["total_ms"] / datos["ejecuciones"])
+            for sql, datos in m["sentencias"].items()
+        }
+        return {
+            "activo": _activo,
+            "umbral_lenta_ms": _umbral_ms,
+            "desde": m["desde"],
+            "limites_histograma_ms": list(LIMITES_MS),
+            "funciones": funciones,
+            "sentencias": sentencias,
+            "trazadas": m["trazadas"],
+            "ultimas_trazas": list(m["ultimas_trazas"]),
+            "lentas": [dict(e) for e in m["lentas"]],
+            "total_lentas": m["total_lentas"],
+            "bloqueos": dict(m["bloqueos"]),
+        }
+
+def volcar_metricas(ruta, extra=None):
+    """
+    Guarda metricas() en un archivo JSON.
+    extra: dict opcional que se agrega al archivo (por ejemplo, las estadísticas de la caché).
+    """
+    datos = metricas()
+    datos["generado"] = datetime.now().isoformat(timespec="seconds")
+    if extra:
+        datos.update(extra)
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+
+def formatear_metricas(m, maximo=15):
+    """Resumen en texto de metricas(), para mostrar en pantalla. Lista las `maximo` más costosas."""
+    lineas = [f"Instrumentación: {'activa' if m['activo'] else 'inactiva'}   "
+              f"Umbral de lentas: {m['umbral_lenta_ms']} ms   Desde: {m['desde']}", ""]
+
+    etiquetas = [f"≤{l}" for l in m["limites_histograma_ms"]] + [f">{m['limites_histograma_ms'][-1]}"]
+    lineas.append("FUNCIONES DEL BACKEND (por tiempo total)")
+    lineas.append(f"{'función':<34}{'llamadas':>9}{'errores':>8}{'media ms':>10}{'máx ms':>10}{'filas':>9}")
+    funciones = sorted(m["funciones"].items(), key=lambda x: x[1]["total_ms"], reverse=True)
+    for nombre, d in funciones[:maximo]:
+        lineas.append(f"{nombre:<34}{d['llamadas']:>9}{d['errores']:>8}{d['media_ms']:>10.2f}"
+                      f"{d['max_ms']:>10.2f}{d['filas']:>9}")
+        lineas.append("    ms: " + "  ".join(f"{e}:{n}" for e, n in zip(etiquetas, d["histograma"]) if n))
+    if not funciones:
+        lineas.append("  (sin llamadas registradas)")
+
+    lineas += ["", f"SENTENCIAS SQL (por tiempo total; {m['trazadas']} trazadas)"]
+    sentencias = sorted(m["sentencias"].items(), key=lambda x: x[1]["total_ms"], reverse=True)
+    for sql, d in sentencias[:maximo]:
+        lineas.append(f"{d['ejecuciones']:>7} x {d['media_ms']:8.2f} ms (máx {d['max_ms']:.2f}, "
+                      f"errores {d['errores']})  {sql[:100]}")
+    if not sentencias:
+        lineas.append("  (sin sentencias registradas)")
+
+    b = m["bloqueos"]
+    media = b["espera_total_ms"] / b["esperas"] if b["esperas"] else 0.0
+    lineas += ["", "BLOQUEOS",
+               f"  Esperas por el candado de escritura: {b['esperas']} (media {media:.2f} ms, máx {b['espera_max_ms']:.2f} ms)",
+               f"  Reintentos por 'database is locked': {b['reintentos']}   Fallos: {b['fallos']}   "
+               f"Sentencias con 'database is locked': {b['errores_bloqueo']}"]
+
+    lineas += ["", f"CONSULTAS LENTAS ({m['total_lentas']} en total, últimas primero)"]
+    for entrada in reversed(m["lentas"][-maximo:]):
+        lineas.append(_formatear_lenta(entrada))
+    if not m["lentas"]:
+        lineas.append("  (ninguna)")
+    return "\n".join(lineas)
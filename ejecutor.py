@@ -0,0 +1,189 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+HILOS = 4                 # Hilos de trabajo (cada uno con su propia conexión a la base)
+INTERVALO_MS = 50         # Cada cuánto Tk revisa si terminó alguna tarea
+
+
+class EjecutorDB:
+    """
+    Grupo de hilos que ejecuta funciones del Backend fuera del hilo de la interfaz.
+    Cada hilo abre su propia conexión la primera vez que la usa (conexion.obtener_conexion
+    es por hilo), así que las consultas de distintos hilos no se estorban.
+    """
+
+    def __init__(self, hilos=HILOS):
+        # Sin initializer: si abrir la base fallara ahí, el pool quedaría roto para siempre;
+        # así el error le llega a la tarea que lo provocó
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="db")
+        self._al_cerrar = {}        # futuro -> función que detiene esa tarea si se cierra el ejecutor
+        self._lock = threading.Lock()
+
+    def enviar(self, funcion, *args, al_cerrar=None, **kwargs):
+        """
+        Encola funcion(*args, **kwargs) y devuelve un Future con su resultado.
+
+        al_cerrar: función opcional sin argumentos que le pide a la tarea que se detenga;
+        cerrar() la llama si la tarea sigue en curso (para tareas largas como importaciones).
+        """
+        futuro = self._pool.submit(funcion, *args, **kwargs)
+        if al_cerrar is not None:
+            with self._lock:
+                self._al_cerrar[futuro] = al_cerrar
+            futuro.add_done_callback(self._olvidar)
+        return futuro
+
+    def _olvidar(self, futuro):
+        with self._lock:
+            self._al_cerrar.pop(futuro, None)
+
+    def cerrar(self, esperar=False):
+        """
+        Detiene los hilos. Las tareas que aún no empezaron se descartan y a las que están
+        corriendo se les pide que se detengan (ver al_cerrar en enviar()).
+
+        Los hilos del pool no son daemon: Python los espera al salir, así que sin esto
+        cerrar la aplicación en medio de una exportación larga la dejaría colgada.
+        """
+        with self._lock:
+            detener = list(self._al_cerrar.values())
+        for al_cerrar in detener:
+            al_cerrar()
+        self._pool.shutdown(wait=esperar, cancel_futures=True)
+
+
+class PuenteTk:
+    """
+    Conecta un EjecutorDB con Tkinter.
+
+    Tk no se puede tocar desde otros hilos, así que en vez de llamar a la interfaz desde
+    el hilo de trabajo, el puente revisa con after() qué tareas terminaron y ejecuta sus
+    funciones al_terminar/al_fallar en el hilo de Tk.
+    """
+
+    def __init__(self, raiz, ejecutor, al_fallar=None, al_cambiar_ocupado=None, intervalo_ms=INTERVALO_MS):
+        """
+        Parámetros:
+        - raiz: ventana principal de Tk (se usa su after())
+        - ejecutor: EjecutorDB donde corren las tareas
+        - al_fallar: función por defecto para los errores, al_fallar(excepcion)
+        - al_cambiar_ocupado: función opcional al_cambiar_ocupado(bool) para mostrar que hay trabajo en curso
+        - intervalo_ms: cada cuánto se revisan las tareas pendientes
+        """
+        self.raiz = raiz
+        self.ejecutor = ejecutor
+        self.al_fallar = al_fallar
+        self.al_cambiar_ocupado = al_cambiar_ocupado
+        self.intervalo_ms = intervalo_ms
+
+        self._pendientes = []     # Lista de (futuro, al_terminar, al_fallar, clave)
+        self._programadas = {}    # clave -> id de after() de una tarea con retraso (debounce)
+        self._ultima = {}         # clave -> último futuro enviado con esa clave
+        self._revisando = False
+        self._ocupado = False
+
+    def ejecutar(self, funcion, *args, al_terminar=None, al_fallar=None, clave=None, retraso_ms=0, al_cerrar=None):
+        """
+        Ejecuta funcion(*args) en el ejecutor y llama a al_terminar(resultado) en el hilo de Tk.
+
+        - al_fallar(excepcion): si no se indica se usa la del puente
+        - clave: si se envía otra tarea con la misma clave, la anterior se cancela y su
+          resultado se descarta (por ejemplo, una búsqueda que quedó vieja)
+        - retraso_ms: espera antes de enviar la tarea; si llega otra con la misma clave
+          durante la espera, sólo se ejecuta la última (debounce)
+        - al_cerrar: ver EjecutorDB.enviar
+        """
+        if clave is not None:
+            self._cancelar_clave(clave)
+
+        def enviar():
+            if clave is not None:
+                self._programadas.pop(clave, None)
+            try:
+                futuro = self.ejecutor.enviar(funcion, *args, al_cerrar=al_cerrar)
+            except Exception as e:
+                # Por ejemplo, el ejecutor ya se cerró: el error se entrega como el de la tarea
+                futuro = Future()
+                futuro.set_exception(e)
+            if clave is not None:
+                self._ultima[clave] = futuro
+            self._pendientes.append((futuro, al_terminar, al_fallar, clave))
+            self._actualizar_ocupado()
+            self._programar_revision()
+
+        if retraso_ms and clave is not None:
+            self._programadas[clave] = self.raiz.after(retraso_ms, enviar)
+            self._actualizar_ocupado()
+        else:
+            enviar()
+
+    def cancelar(self, clave):
+        """Cancela la tarea pendiente o programada con esa clave (su resultado no se entrega)."""
+        self._cancelar_clave(clave)
+        self._actualizar_ocupado()
+
+    @property
+    def ocupado(self):
+        return bool(self._pendientes or self._programadas)
+
+    def _cancelar_clave(self, clave):
+        programada = self._programadas.pop(clave, None)
+        if programada is not None:
+            self.raiz.after_cancel(programada)
+        anterior = self._ultima.pop(clave, None)
+        if anterior is not None:
+            # Si ya está corriendo no se puede detener, pero su resultado se va a ignorar
+            anterior.cancel()
+
+    def _programar_revision(self):
+        if not self._revisando:
+            self._revisando = True
+            self.raiz.after(self.intervalo_ms, self._revisar)
+
+    def _revisar(self):
+        """Entrega los resultados de las tareas terminadas (corre en el hilo de Tk)."""
+        self._revisando = False
+        terminadas, pendientes = [], []
+        for tarea in self._pendientes:
+            # done() se consulta una sola vez por tarea: puede cambiar mientras revisamos
+            (terminadas if tarea[0].done() else pendientes).append(tarea)
+        self._pendientes = pendientes
+
+        try:
+            for futuro, al_terminar, al_fallar, clave in terminadas:
+                try:
+                    self._entregar(futuro, al_terminar, al_fallar, clave)
+                except Exception as e:
+                    # Un error en al_terminar no debe impedir entregar las demás tareas
+                    if self.al_fallar is None:
+                        raise
+                    self.al_fallar(e)
+        finally:
+            self._actualizar_ocupado()
+            if self._pendientes:
+                self._programar_revision()
+
+    def _entregar(self, futuro, al_terminar, al_fallar, clave):
+        if clave is not None:
+            if self._ultima.get(clave) is not futuro:
+                return   # Llegó otra tarea con la misma clave: este resultado ya no sirve
+            del self._ultima[clave]
+        if futuro.cancelled():
+            return
+        error = futuro.exception()
+        if error is None:
+            if al_terminar is not None:
+                al_terminar(futuro.result())
+        else:
+            manejador = al_fallar or self.al_fallar
+            if manejador is None:
+                raise error
+            manejador(error)
+
+    def _actualizar_ocupado(self):
+        ocupado = self.ocupado
+        if ocupado != self._ocupado:
+            self._ocupado = ocupado
+            if self.al_cambiar_ocupado is not None:
+                self.al_cambiar_ocupado(ocupado)
@@ -0,0 +1,171 @@
+import csv
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from Backend import iter_productos, contar_productos
+from Backend import iter_estadisticas_ventas, contar_estadisticas_ventas
+
+
+# Cada cuántas filas avisamos el progreso y revisamos si el usuario canceló
+FILAS_POR_AVISO = 500
+
+ENCABEZADOS_INVENTARIO = ['ID', 'Nombre', 'Categoría', 'Precio']
+ENCABEZADOS_VENTAS = ['Producto', 'Cantidad Vendida', 'Precio Unitario', 'Total Ingresos']
+
+
+class ExportacionCancelada(Exception):
+    """Se lanza cuando el usuario cancela una exportación en curso."""
+
+
+@contextmanager
+def _escritor_csv(ruta, hoja):
+    """Devuelve una función que escribe una fila en el CSV. `hoja` no se usa en CSV."""
+    # utf-8-sig para que Excel muestre bien las tildes al abrir el archivo
+    with open(ruta, "w", newline="", encoding="utf-8-sig") as f:
+        yield csv.writer(f).writerow
+
+
+@contextmanager
+def _escritor_xlsx(ruta, hoja):
+    """
+    Devuelve una función que escribe una fila en el XLSX.
+    El modo write_only de openpyxl va volcando las filas a disco en vez de guardarlas en memoria.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    pagina = libro.create_sheet(title=hoja)
+    yield pagina.append
+    libro.save(ruta)
+
+
+def exportar_filas(filas, encabezados, ruta, hoja="Datos", total_filas=None, sumar=(),
+                   progreso=None, cancelar=None):
+    """
+    Escribe `filas` en un archivo CSV o XLSX (según la extensión de `ruta`) sin cargarlas en memoria.
+
+    Parámetros:
+    - filas: iterable/generador con las filas a escribir
+    - encabezados: nombres de las columnas
+    - ruta: archivo de destino (.csv o .xlsx)
+    - hoja: nombre de la hoja (sólo XLSX)
+    - total_filas: cantidad esperada de filas, para informar el progreso (opcional)
+    - sumar: índices de columnas que se van sumando; si hay alguno se agrega una fila "TOTAL"
+    - progreso: función opcional progreso(filas_escritas, total_filas)
+    - cancelar: threading.Event opcional; si se activa se detiene y se lanza ExportacionCancelada
+
+    El archivo se escribe primero en un temporal y se mueve a `ruta` al terminar,
+    así nunca queda un archivo a medias si algo falla o se cancela.
+
+    Retorna:
+    int: cantidad de filas de datos escritas
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    escritor = _escritor_csv if extension == ".csv" else _escritor_xlsx
+
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, suffix=extension or ".tmp")
+    os.close(descriptor)
+
+    escritas = 0
+    totales = {indice: 0 for indice in sumar}
+    try:
+        with escritor(temporal, hoja) as escribir:
+            escribir(encabezados)
+            for fila in filas:
+                escribir(fila)
+                escritas += 1
+                # Vamos calculando los totales mientras escribimos
+                for indice in totales:
+                    totales[indice] += fila[indice] or 0
+
+                if escritas % FILAS_POR_AVISO == 0:
+                    if cancelar is not None and cancelar.is_set():
+                        raise ExportacionCancelada()
+                    if progreso:
+                        progreso(escritas, total_filas)
+
+            if totales:
+                fila_total = [""] * len(encabezados)
+                fila_total[0] = "TOTAL"
+                for indice, valor in totales.items():
+                    fila_total[indice] = valor
+                escribir(fila_total)
+
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    if progreso:
+        progreso(escritas, total_filas)
+    return escritas
+
+
+def exportar_inventario(ruta, progreso=None, cancelar=None):
+    """Exporta todos los productos (ID, Nombre, Categoría, Precio) a un CSV/XLSX."""
+    return exportar_filas(iter_productos(), ENCABEZADOS_INVENTARIO, ruta, hoja='Inventario',
+                          total_filas=contar_productos(), progreso=progreso, cancelar=cancelar)
+
+
+def exportar_ventas(ruta, progreso=None, cancelar=None):
+    """Exporta el reporte de ventas por producto, con una fila final de totales."""
+    return exportar_filas(iter_estadisticas_ventas(), ENCABEZADOS_VENTAS, ruta,
+                          hoja='Reporte de Ventas', total_filas=contar_estadisticas_ventas(),
+                          sumar=(1, 3), progreso=progreso, cancelar=cancelar)
+
+
+class ExportacionEnSegundoPlano:
+    """
+    Corre una función de exportación (exportar_inventario, exportar_ventas...) en otro hilo.
+
+    La interfaz consulta `escritas`, `total` y `terminada` cada tanto para mostrar el avance;
+    al terminar, `resultado` tiene las filas escritas o `error` la excepción ocurrida.
+    """
+
+    def __init__(self, funcion, ruta):
+        self.funcion = funcion
+        self.ruta = ruta
+        self.escritas = 0
+        self.total = None
+        self.resultado = None
+        self.error = None
+        self.terminada = False
+        self._cancelar = threading.Event()
+        # daemon=True: si se cierra la aplicación no nos quedamos esperando la exportación.
+        # Con un EjecutorDB sus hilos no son daemon; en ese caso EjecutorDB.cerrar() la cancela
+        self._hilo = threading.Thread(target=self._correr, daemon=True)
+
+    def iniciar(self, ejecutor=None):
+        """
+        Arranca la exportación. Si se pasa un EjecutorDB corre en uno de sus hilos
+        (y se cancela si el ejecutor se cierra); si no, en un hilo propio.
+        """
+        if ejecutor is not None:
+            ejecutor.enviar(self._correr, al_cerrar=self.cancelar)
+        else:
+            self._hilo.start()
+        return self
+
+    def cancelar(self):
+        """Pide que se detenga la exportación; se detiene en el próximo aviso de progreso."""
+        self._cancelar.set()
+
+    @property
+    def cancelada(self):
+        return isinstance(self.error, ExportacionCancelada)
+
+    def _progreso(self, escritas, total):
+        self.escritas = escritas
+        self.total = total
+
+    def _correr(self):
+        try:
+            self.resultado = self.funcion(self.ruta, progreso=self._progreso, cancelar=self._cancelar)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.terminada = True
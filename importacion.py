@@ -0,0 +1,104 @@
+import csv
+import os
+import unicodedata
+
+from Backend import agregar_productos_bulk, TAMANO_LOTE
+
+
+# Columnas que buscamos en el archivo (mismos encabezados que usa "Verificar Inventario")
+COLUMNAS = ("nombre", "categoria", "precio")
+
+
+class ImportacionCancelada(Exception):
+    """Se lanza cuando se cancela una importación en curso."""
+
+
+def _normalizar(encabezado):
+    """Pasa 'Categoría ' a 'categoria' para comparar encabezados sin importar tildes ni mayúsculas."""
+    texto = unicodedata.normalize("NFKD", str(encabezado or "")).encode("ascii", "ignore").decode()
+    return texto.strip().lower()
+
+
+def _posiciones(encabezados):
+    """Devuelve el índice de cada columna requerida dentro de la fila de encabezados."""
+    normalizados = [_normalizar(e) for e in encabezados]
+    faltantes = [c for c in COLUMNAS if c not in normalizados]
+    if faltantes:
+        raise ValueError("Faltan columnas en el archivo: " + ", ".join(faltantes))
+    return [normalizados.index(c) for c in COLUMNAS]
+
+
+def _filas_csv(ruta):
+    """Lee un CSV fila por fila (utf-8-sig acepta los archivos guardados desde Excel)."""
+    with open(ruta, newline="", encoding="utf-8-sig") as f:
+        lector = csv.reader(f)
+        encabezados = next(lector, None)
+        if encabezados is None:
+            return
+        indices = _posiciones(encabezados)
+        for fila in lector:
+            if not any(fila):
+                yield None   # Línea en blanco: se salta, pero cuenta para numerar las filas
+                continue
+            yield tuple(fila[i] if i < len(fila) else None for i in indices)
+
+
+def _filas_xlsx(ruta):
+    """Lee un XLSX en modo sólo lectura: openpyxl va leyendo la hoja sin cargarla entera."""
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if encabezados is None:
+            return
+        indices = _posiciones(encabezados)
+        for fila in filas:
+            if not any(valor not in (None, "") for valor in fila):
+                yield None
+                continue
+            yield tuple(fila[i] if i < len(fila) else None for i in indices)
+    finally:
+        libro.close()
+
+
+def leer_inventario(ruta):
+    """
+    Generador con las filas (nombre, categoria, precio) de un archivo CSV o XLSX.
+    Las filas vacías se entregan como None para no perder la numeración.
+    El archivo se recorre de a una fila, así que su tamaño no importa.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == ".csv":
+        return _filas_csv(ruta)
+    if extension in (".xlsx", ".xlsm"):
+        return _filas_xlsx(ruta)
+    raise ValueError(f"Formato no soportado: {extension or 'sin extensión'} (use .csv o .xlsx)")
+
+
+def _hasta_cancelar(filas, cancelar):
+    """Entrega las filas mientras `cancelar` no esté activado; si se activa, lanza ImportacionCancelada."""
+    for fila in filas:
+        if cancelar.is_set():
+            raise ImportacionCancelada()
+        yield fila
+
+
+def importar_inventario(ruta, tamano_lote=TAMANO_LOTE, progreso=None, cancelar=None):
+    """
+    Importa productos desde un archivo CSV/XLSX usando la carga masiva por lotes.
+
+    cancelar: threading.Event opcional; si se activa, se deja de leer el archivo y se lanza
+    ImportacionCancelada. Los lotes ya guardados quedan guardados; el lote en curso no.
+
+    Retorna:
+    dict: {"insertados": int, "errores": [(fila del archivo, mensaje), ...], "total_errores": int}
+    (como en Backend.agregar_productos_bulk, errores trae sólo los primeros)
+    """
+    filas = leer_inventario(ruta)
+    if cancelar is not None:
+        filas = _hasta_cancelar(filas, cancelar)
+    # La fila 1 del archivo es el encabezado, así que los datos empiezan en la 2
+    return agregar_productos_bulk(filas, tamano_lote=tamano_lote,
+                                  primera_fila=2, progreso=progreso)
@@ -0,0 +1,52 @@
+"""
+Tareas de mantenimiento de la base de datos, para correr desde la terminal.
+
+Uso:
+    python mantenimiento.py verificar-ventas [--db usuarios.db]
+    python mantenimiento.py reconstruir-ventas [--db usuarios.db]
+"""
+import argparse
+import sys
+
+import conexion
+from Backend import verificar_resumen_ventas, reconstruir_resumen_ventas
+
+
+def verificar_ventas():
+    """Muestra las diferencias entre los resúmenes de ventas y la tabla pedidos."""
+    diferencias = verificar_resumen_ventas()
+    if not diferencias:
+        print("Los resúmenes de ventas coinciden con los pedidos.")
+        return 0
+    print(f"Se encontraron {len(diferencias)} diferencias:")
+    for producto_id, dia, real, resumen in diferencias:
+        donde = dia or "total"
+        print(f"  producto {producto_id} ({donde}): pedidos={real} resumen={resumen}")
+    return 1
+
+
+def reconstruir_ventas():
+    """Recalcula los resúmenes de ventas desde cero y confirma que quedaron bien."""
+    reconstruir_resumen_ventas()
+    print("Resúmenes de ventas reconstruidos.")
+    return verificar_ventas()
+
+
+COMANDOS = {
+    "verificar-ventas": verificar_ventas,
+    "reconstruir-ventas": reconstruir_ventas,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos de la tienda.")
+    parser.add_argument("comando", choices=sorted(COMANDOS))
+    parser.add_argument("--db", default=conexion.DB_NAME, help="archivo de base de datos")
+    args = parser.parse_args(argv)
+
+    conexion.configurar_db(args.db)
+    return COMANDOS[args.comando]()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+
+import pytest
+
+import Backend
+import conexion
+
+
+@pytest.fixture
+def base(tmp_path):
+    """Base de datos nueva para cada prueba, con un producto y la caché vacía."""
+    anterior = conexion.DB_NAME
+    ruta = str(tmp_path / "prueba.db")
+    conexion.configurar_db(ruta)
+    Backend.agregar_producto_db("Camisa", "Ropa", 50000)
+    Backend.limpiar_cache()
+    yield ruta
+    conexion.configurar_db(anterior)
+
+
+def _en_otro_hilo(funcion, *args):
+    resultado = {}
+    hilo = threading.Thread(target=lambda: resultado.setdefault("valor", funcion(*args)))
+    hilo.start()
+    hilo.join()
+    return resultado.get("valor")
+
+
+def test_escritura_externa_no_queda_oculta_por_una_escritura_local(base):
+    assert len(Backend.obtener_productos_db()) == 1
+
+    # Otra conexión (como otro proceso) agrega un producto sin avisar al Backend
+    externa = sqlite3.connect(base)
+    externa.execute("INSERT INTO productos (nombre, categoria, precio) VALUES ('Botas', 'Zapatos', 90000)")
+    externa.commit()
+    externa.close()
+
+    # Una escritura local de otra tabla no debe hacer pasar por vista la escritura externa
+    Backend.hacer_pedido_db("ana", 1, 1)
+
+    assert len(Backend.obtener_productos_db()) == 2
+
+
+def test_escritura_de_otro_hilo_solo_invalida_sus_tablas(base):
+    Backend.obtener_productos_db()
+    Backend.buscar_producto_db("cam")
+    Backend.cache.reiniciar_estadisticas()
+
+    _en_otro_hilo(Backend.hacer_pedido_db, "ana", 1, 1)
+    Backend.obtener_productos_db()
+    Backend.buscar_producto_db("cam")
+
+    estadisticas = Backend.estadisticas_cache()
+    assert estadisticas["aciertos"] == 2
+    assert estadisticas["fallos"] == 0
+
+
+def test_escritura_local_de_la_tabla_invalida_el_resultado(base):
+    assert len(Backend.obtener_productos_db()) == 1
+    _en_otro_hilo(Backend.agregar_producto_db, "Botas", "Zapatos", 90000)
+    assert len(Backend.obtener_productos_db()) == 2